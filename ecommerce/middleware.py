@@ -0,0 +1,41 @@
+import logging
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+
+class NPlusOneError(Exception):
+    pass
+
+
+class NPlusOneMiddleware:
+    """
+    Development guard against N+1 regressions: counts each distinct SQL statement (parameters aside)
+    a request runs, and reports any that repeat more than N_PLUS_ONE_THRESHOLD times.
+    Raises NPlusOneError when N_PLUS_ONE_RAISE is set (CI), otherwise logs a warning.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counts = Counter()
+
+        def count_query(execute, sql, params, many, context):
+            counts[sql] += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count_query):
+            response = self.get_response(request)
+
+        repeated = [(sql, n) for sql, n in counts.most_common() if n > settings.N_PLUS_ONE_THRESHOLD]
+        if repeated:
+            sql, n = repeated[0]
+            message = f"{request.method} {request.path} ran {n}x: {sql[:300]}"
+            if settings.N_PLUS_ONE_RAISE:
+                raise NPlusOneError(message)
+            logger.warning("Possible N+1 query (%d repeated statements): %s", len(repeated), message)
+        return response
@@ -48,6 +48,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'blog',
     'userauth',
     'import_export',
@@ -121,6 +122,29 @@ else:
         }
     }
 
+# Cache (catalogue responses); Redis in production, per-process memory locally
+if not PRODUCTION:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('REDIS_CACHE_URL', 'redis://redis:6379/1'),
+        }
+    }
+
+CATALOGUE_CACHE_SECONDS = 60
+
+# Flag requests that repeat one query per row (N+1); off in production, raising in CI
+if not PRODUCTION:
+    MIDDLEWARE.append('ecommerce.middleware.NPlusOneMiddleware')
+N_PLUS_ONE_THRESHOLD = 10
+N_PLUS_ONE_RAISE = os.environ.get('N_PLUS_ONE_RAISE', 'False') == 'True'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -302,4 +326,6 @@ CELERY_TIMEZONE = 'UTC'
 
 
 FACEBOOK_PAGE_ACCESS_TOKEN = os.environ.get('FACEBOOK_PAGE_ACCESS_TOKEN')
-FACEBOOK_PAGE_ID = os.environ.get('FACEBOOK_PAGE_ID')
\ No newline at end of file
+FACEBOOK_PAGE_ID = os.environ.get('FACEBOOK_PAGE_ID')
+# Announce each newly created product on the Facebook page (shop.signals.post_to_fb)
+FACEBOOK_AUTO_POST = os.environ.get('FACEBOOK_AUTO_POST', 'False') == 'True'
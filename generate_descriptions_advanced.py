@@ -5,118 +5,44 @@ Supports dry-run mode, filtering, and batch operations.
 """
 
 import os
-import django
-import argparse
-import json
 import time
-from datetime import datetime
-from typing import Optional
-
-# Setup Django
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ecommerce.settings')
-django.setup()
+import asyncio
+import argparse
 
+from seo_gen import (  # Sets up Django
+    AsyncGenerator,
+    AsyncRunner,
+    add_cache_arguments,
+    cache_options,
+    exclude_optimized,
+    pad,
+    progress_bar,
+    update_progress,
+)
 from shop.models import Product
-import google.generativeai as genai
 
-class DescriptionGenerator:
-    def __init__(self, api_key: str, batch_size: int = 5):
-        self.api_key = api_key
-        self.batch_size = batch_size
-        self.model = None
-        self.setup_genai()
+async def generate_product(generator, name, category, brand, keywords=False):
+    """
+    Generate description, meta and (optionally) keywords for one product.
+
+    Keywords don't depend on the description, so both are requested together;
+    only the meta description has to wait for the new description.
+    Returns (description, meta, keywords); later fields are None on failure.
+    """
+    if keywords:
+        new_desc, new_keywords = await asyncio.gather(
+            generator.generate_description_async(name, category, brand),
+            generator.generate_meta_keywords_async(name, category, brand),
+        )
+    else:
+        new_desc, new_keywords = await generator.generate_description_async(name, category, brand), None
     
-    def setup_genai(self):
-        """Configure Google Generative AI."""
-        genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel('gemini-1.5-flash')
+    if not new_desc:
+        return None, None, new_keywords
     
-    def generate_description(self, product_name: str, category: str, brand: str, specs: Optional[str] = None) -> Optional[str]:
-        """Generate a unique product description."""
-        
-        specs_context = f"Key specs: {specs}" if specs else ""
-        
-        prompt = f"""Generate a unique, compelling product description for an e-commerce website.
-
-Product Name: {product_name}
-Category: {category}
-Brand: {brand}
-{specs_context}
-
-Requirements:
-- Write 2-3 sentences (50-100 words)
-- Focus on benefits and key features
-- SEO-friendly but natural
-- Unique - not generic or template-like
-- Professional but conversational
-- Include performance/value proposition
-- NO markdown, plain text only
+    new_meta = await generator.generate_meta_description_async(name, new_desc, brand)
+    return new_desc, new_meta, new_keywords
 
-Output ONLY the description, nothing else."""
-
-        try:
-            response = self.model.generate_content(prompt)
-            return response.text.strip()
-        except Exception as e:
-            print(f"Error: {e}")
-            return None
-    
-    def generate_meta_description(self, product_name: str, description: str, brand: str) -> Optional[str]:
-        """Generate SEO meta description (155 chars)."""
-        
-        prompt = f"""Generate a concise meta description for search engines.
-
-Product: {product_name}
-Brand: {brand}
-Description: {description}
-
-Requirements:
-- MUST be 150-160 characters
-- Include main keywords naturally
-- Compelling to click from search results
-- Include brand if possible
-- NO markdown
-
-Output ONLY the meta description, nothing else."""
-
-        try:
-            response = self.model.generate_content(prompt)
-            result = response.text.strip()
-            
-            # Truncate if too long
-            if len(result) > 160:
-                result = result[:157] + "..."
-            
-            return result
-        except Exception as e:
-            print(f"Error: {e}")
-            return None
-    
-    def generate_meta_keywords(self, product_name: str, category: str, brand: str) -> Optional[str]:
-        """Generate SEO keywords."""
-        
-        prompt = f"""Generate SEO keywords for this product.
-
-Product: {product_name}
-Category: {category}
-Brand: {brand}
-
-Requirements:
-- 5-8 relevant keywords
-- Separated by commas
-- Focus on what customers search for
-- Include brand name
-- Include category
-- Include specific product type
-
-Output ONLY the keywords, nothing else."""
-
-        try:
-            response = self.model.generate_content(prompt)
-            return response.text.strip()
-        except Exception as e:
-            print(f"Error: {e}")
-            return None
 
 def main():
     parser = argparse.ArgumentParser(description='Generate SEO-friendly product descriptions')
@@ -125,7 +51,9 @@ def main():
     parser.add_argument('--limit', type=int, help='Process only N products')
     parser.add_argument('--skip', type=int, default=0, help='Skip first N products')
     parser.add_argument('--keywords', action='store_true', help='Also generate meta keywords')
+    parser.add_argument('--force', action='store_true', help='Also regenerate products that already have SEO content')
     parser.add_argument('--batch-size', type=int, default=5, help='Batch size for progress saves')
+    add_cache_arguments(parser)
     
     args = parser.parse_args()
     
@@ -135,21 +63,27 @@ def main():
         print("❌ ERROR: GOOGLE_API_KEY not set!")
         exit(1)
     
-    generator = DescriptionGenerator(api_key, batch_size=args.batch_size)
+    generator = AsyncGenerator(api_key, **cache_options(args))
+    runner = AsyncRunner()
     
     # Get products
-    query = Product.objects.all()
+    query = Product.objects.select_related('category', 'brand')
     
     if args.category:
         query = query.filter(category__name__icontains=args.category)
     
+    if not args.force:
+        before = query.count()
+        query = exclude_optimized(query)
+        skipped = before - query.count()
+        print(f"⏭️  Skipping {skipped} already-optimized products (use --force to include them)")
+    
     query = query[args.skip:]
     
     if args.limit:
         query = query[:args.limit]
     
-    products = list(query)
-    total = len(products)
+    total = query.count()
     
     print(f"\n📊 Found {total} products to process")
     
@@ -161,27 +95,17 @@ def main():
         return
     
     # Show sample
-    if products:
+    if total:
         print("\n📋 Generating sample...\n")
-        sample = products[0]
+        sample = query[0]
         
-        new_desc = generator.generate_description(
+        new_desc, new_meta, new_keywords = runner.run(generate_product(
+            generator,
             sample.name,
             sample.category.name if sample.category else "Product",
-            sample.brand.name if sample.brand else "Brand"
-        )
-        time.sleep(1)
-        
-        new_meta = generator.generate_meta_description(sample.name, new_desc, sample.brand.name if sample.brand else "Brand")
-        time.sleep(1)
-        
-        if args.keywords:
-            new_keywords = generator.generate_meta_keywords(
-                sample.name,
-                sample.category.name if sample.category else "Product",
-                sample.brand.name if sample.brand else "Brand"
-            )
-            time.sleep(1)
+            sample.brand.name if sample.brand else "Brand",
+            keywords=args.keywords
+        ))
         
         print(f"Product: {sample.name}\n")
         print(f"OLD Description:\n{sample.description[:150]}...\n")
@@ -201,60 +125,59 @@ def main():
     # Process all
     print(f"\n🔄 Processing {total} products...\n")
     
-    for idx, product in enumerate(products, 1):
-        try:
-            print(f"[{idx}/{total}] {product.name[:50]:<50}", end=" ", flush=True)
-            
-            # Generate
-            new_desc = generator.generate_description(
-                product.name,
-                product.category.name if product.category else "Product",
-                product.brand.name if product.brand else "Brand"
-            )
-            time.sleep(0.5)
-            
-            if not new_desc:
-                print("❌ Description failed")
-                continue
-            
-            new_meta = generator.generate_meta_description(
-                product.name,
-                new_desc,
-                product.brand.name if product.brand else "Brand"
-            )
-            time.sleep(0.5)
-            
-            if not new_meta:
-                print("❌ Meta failed")
-                continue
-            
-            updates = {
-                'description': new_desc,
-                'meta_description': new_meta,
-            }
-            
-            if args.keywords:
-                new_keywords = generator.generate_meta_keywords(
+    updated_count = 0
+    failed_count = 0
+    start_time = time.time()
+    
+    with progress_bar(total) as pbar:
+        for idx, product in enumerate(query.iterator(chunk_size=200), 1):
+            label = f"[{idx}/{total}] {pad(product.name, 50)}"
+            try:
+                # Generate
+                new_desc, new_meta, new_keywords = runner.run(generate_product(
+                    generator,
                     product.name,
                     product.category.name if product.category else "Product",
-                    product.brand.name if product.brand else "Brand"
-                )
-                time.sleep(0.5)
+                    product.brand.name if product.brand else "Brand",
+                    keywords=args.keywords
+                ))
+                
+                if not new_desc:
+                    pbar.write(f"{label} ❌ Description failed")
+                    failed_count += 1
+                    continue
+                
+                if not new_meta:
+                    pbar.write(f"{label} ❌ Meta failed")
+                    failed_count += 1
+                    continue
+                
+                updates = {
+                    'description': new_desc,
+                    'meta_description': new_meta,
+                }
+                
                 if new_keywords:
                     updates['meta_keywords'] = new_keywords
+                
+                if not args.dry_run:
+                    for key, value in updates.items():
+                        setattr(product, key, value)
+                    product.save()
+                updated_count += 1
             
-            if args.dry_run:
-                print("✅ (DRY RUN)")
-            else:
-                for key, value in updates.items():
-                    setattr(product, key, value)
-                product.save()
-                print("✅")
-        
-        except Exception as e:
-            print(f"❌ {str(e)[:30]}")
+            except Exception as e:
+                pbar.write(f"{label} ❌ {str(e)[:30]}")
+                failed_count += 1
+            
+            finally:
+                update_progress(pbar, generator, updated_count, failed_count, start_time)
+    
+    runner.close()
     
-    print(f"\n✨ Complete!")
+    print(f"\n✨ Complete!{' (DRY RUN)' if args.dry_run else ''}")
+    print(f"✅ Updated: {updated_count} products")
+    print(f"❌ Failed: {failed_count} products")
 
 if __name__ == '__main__':
     main()
@@ -5,85 +5,21 @@ Minimal API calls - ~100 calls for 500 products with batch processing.
 """
 
 import os
-import django
-import argparse
 import time
+import argparse
 from datetime import datetime
 
-# Setup Django
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ecommerce.settings')
-django.setup()
-
+from seo_gen import (  # Sets up Django
+    BatchedGenerator,
+    add_cache_arguments,
+    cache_options,
+    chunked,
+    exclude_optimized,
+    progress_bar,
+    update_progress,
+)
 from shop.models import Product
-import google.generativeai as genai
-
-class MetaDescriptionGenerator:
-    def __init__(self, api_key: str):
-        self.api_key = api_key
-        self.model = None
-        self.setup_genai()
-        self.call_count = 0
-    
-    def setup_genai(self):
-        """Configure Google Generative AI."""
-        genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel('gemini-1.5-flash')
-    
-    def generate_batch_metas(self, products_data):
-        """
-        Generate meta descriptions for multiple products at once.
-        """
-        
-        product_list = "\n".join([
-            f"{i+1}. {p['name']} - {p['brand']}"
-            for i, p in enumerate(products_data)
-        ])
-        
-        prompt = f"""Generate SEO meta descriptions for these products. These appear in Google search results.
-
-PRODUCTS:
-{product_list}
-
-For EACH product:
-- Write 150-160 characters exactly
-- Include product name and key benefit
-- Make it compelling to click
-- Include brand if possible
-- NO markdown, NO special characters
-
-Format EXACTLY as:
-1. [meta description]
-2. [meta description]
-etc.
-
-Start with "1." only, nothing before it."""
-
-        try:
-            response = self.model.generate_content(prompt)
-            self.call_count += 1
-            
-            text = response.text.strip()
-            metas = []
-            lines = text.split('\n')
-            
-            for line in lines:
-                line = line.strip()
-                if line and line[0].isdigit() and '.' in line:
-                    meta = line.split('.', 1)[1].strip()
-                    # Enforce 160 char limit
-                    if len(meta) > 160:
-                        meta = meta[:157] + "..."
-                    metas.append(meta)
-            
-            # Pad with None if parsing failed
-            while len(metas) < len(products_data):
-                metas.append(None)
-            
-            return metas[:len(products_data)]
-        
-        except Exception as e:
-            print(f"Error: {e}")
-            return [None] * len(products_data)
+from shop.cache import bump_catalogue_version
 
 def main():
     parser = argparse.ArgumentParser(description='Generate meta descriptions only')
@@ -91,6 +27,8 @@ def main():
     parser.add_argument('--category', type=str, help='Filter by category')
     parser.add_argument('--limit', type=int, help='Max products to process')
     parser.add_argument('--batch-size', type=int, default=5, help='Products per API call')
+    parser.add_argument('--force', action='store_true', help='Also regenerate products that already have a good meta description')
+    add_cache_arguments(parser)
     
     args = parser.parse_args()
     
@@ -101,19 +39,25 @@ def main():
         print("Get one at: https://aistudio.google.com/apikey")
         exit(1)
     
-    generator = MetaDescriptionGenerator(api_key)
+    generator = BatchedGenerator(api_key, **cache_options(args))
     
     # Get products
-    query = Product.objects.all()
+    # Only the columns the prompts and the update need; rows are streamed per batch
+    query = Product.objects.select_related('brand').only('product_id', 'name', 'meta_description', 'brand__name')
     
     if args.category:
         query = query.filter(category__name__icontains=args.category)
     
+    if not args.force:
+        before = query.count()
+        query = exclude_optimized(query, descriptions=False)
+        skipped = before - query.count()
+        print(f"⏭️  Skipping {skipped} already-optimized products (use --force to include them)")
+    
     if args.limit:
         query = query[:args.limit]
     
-    products = list(query)
-    total = len(products)
+    total = query.count()
     
     print(f"\n📊 Found {total} products")
     print(f"🔋 Batch size: {args.batch_size}")
@@ -129,7 +73,7 @@ def main():
     
     if args.dry_run:
         print("🔍 DRY RUN MODE\n")
-        sample = products[0]
+        sample = query[0]
         print(f"Sample: {sample.name}")
         print(f"Current meta: {sample.meta_description}")
         print(f"Would generate: {api_calls} API calls")
@@ -137,14 +81,13 @@ def main():
     
     # Show sample
     print("📋 Generating sample meta description...\n")
-    sample = products[0]
+    sample = query[0]
     products_for_sample = [{
         'name': sample.name,
         'brand': sample.brand.name if sample.brand else 'Brand'
     }]
     
     sample_metas = generator.generate_batch_metas(products_for_sample)
-    time.sleep(1)
     
     if sample_metas[0]:
         print(f"Product: {sample.name}")
@@ -160,53 +103,62 @@ def main():
     
     updated_count = 0
     failed_count = 0
+    start_time = time.time()
+    
+    total_batches = (total + args.batch_size - 1) // args.batch_size
     
     # Process in batches
-    for batch_start in range(0, total, args.batch_size):
-        batch_end = min(batch_start + args.batch_size, total)
-        batch = products[batch_start:batch_end]
-        batch_num = (batch_start // args.batch_size) + 1
-        total_batches = (total + args.batch_size - 1) // args.batch_size
+    with progress_bar(total) as pbar:
+        batches = chunked(query.iterator(chunk_size=200), args.batch_size)
+        for batch_num, batch in enumerate(batches, 1):
         
-        print(f"[Batch {batch_num}/{total_batches}] ", end="", flush=True)
+            label = f"[Batch {batch_num}/{total_batches}]"
         
-        try:
-            # Prepare product info
-            products_data = [
-                {
-                    'name': p.name,
-                    'brand': p.brand.name if p.brand else 'Brand'
-                }
-                for p in batch
-            ]
+            try:
+                # Prepare product info
+                products_data = [
+                    {
+                        'name': p.name,
+                        'brand': p.brand.name if p.brand else 'Brand'
+                    }
+                    for p in batch
+                ]
             
-            # Generate metas
-            metas = generator.generate_batch_metas(products_data)
-            time.sleep(0.5)
+                # Generate metas
+                metas = generator.generate_batch_metas(products_data)
             
-            if all(m is None for m in metas):
-                print(f"❌ Generation failed")
-                failed_count += len(batch)
-                continue
-            
-            # Update database
-            for i, product in enumerate(batch):
-                if metas[i]:
-                    product.meta_description = metas[i]
-                    product.save()
-                    updated_count += 1
+                if all(m is None for m in metas):
+                    pbar.write(f"{label} ❌ Generation failed")
+                    failed_count += len(batch)
+                    continue
             
-            print(f"✅ {len(batch)} products ({updated_count}/{total})")
+                # Update database (one UPDATE round-trip for the whole batch)
+                to_update = []
+                for product, meta in zip(batch, metas):
+                    if meta:
+                        product.meta_description = meta
+                        to_update.append(product)
+                
+                Product.objects.bulk_update(to_update, ['meta_description'])
+                updated_count += len(to_update)
+                failed_count += len(batch) - len(to_update)
         
-        except Exception as e:
-            print(f"❌ {str(e)[:40]}")
-            failed_count += len(batch)
+            except Exception as e:
+                pbar.write(f"{label} ❌ {str(e)[:40]}")
+                failed_count += len(batch)
+            
+            finally:
+                update_progress(pbar, generator, updated_count, failed_count, start_time, n=len(batch))
+    
+    if updated_count:
+        bump_catalogue_version()  # bulk_update sends no post_save, so expire the cached catalogue responses here
     
     print(f"\n{'='*60}")
     print(f"✨ Complete!")
     print(f"✅ Updated: {updated_count} products")
     print(f"❌ Failed: {failed_count} products")
     print(f"📞 API calls used: {generator.call_count}")
+    print(f"♻️  Cache hits: {generator.cache.hits}")
     print(f"⏰ {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print(f"{'='*60}\n")
 
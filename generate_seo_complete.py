@@ -5,7 +5,7 @@ Updates product names, descriptions, and meta descriptions using Gemini AI.
 
 Features:
 - Loads API key from .env file (secure)
-- Batch processing to minimize API calls (3x fewer calls)
+- Batch processing to minimize API calls (one JSON call per batch)
 - Progress tracking and resumable
 - Comprehensive error handling
 - Dry-run preview mode
@@ -14,21 +14,31 @@ Features:
 """
 
 import os
-import django
-import json
 import time
 import argparse
 import sys
+from concurrent.futures import FIRST_COMPLETED, wait
 from datetime import datetime
 from pathlib import Path
-from typing import List, Dict, Optional, Tuple
-
-# Setup Django
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ecommerce.settings')
-django.setup()
-
+from typing import List, Dict
+
+from seo_gen import (  # Sets up Django
+    AsyncGenerator,
+    AsyncRunner,
+    LOG_FILE,
+    add_cache_arguments,
+    cache_options,
+    chunked,
+    exclude_optimized,
+    log_message,
+    pad,
+    progress_bar,
+    update_progress,
+)
+import orjson
+from django.db import transaction
 from shop.models import Product
-import google.generativeai as genai
+from shop.cache import bump_catalogue_version
 from dotenv import load_dotenv
 
 # ============================================================================
@@ -41,275 +51,101 @@ load_dotenv(ENV_PATH)
 
 API_KEY = os.getenv('GOOGLE_API_KEY')
 BATCH_SIZE = 5  # Products per API call (optimal for cost/speed)
-DELAY_BETWEEN_CALLS = 0.8  # Seconds between API calls (prevent rate limiting)
-PROGRESS_FILE = 'seo_generation_progress.json'
-LOG_FILE = 'seo_generation.log'
-
-# ============================================================================
-# LOGGING
-# ============================================================================
-
-def log_message(msg: str, level: str = "INFO"):
-    """Log messages to both console and file."""
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    log_entry = f"[{timestamp}] [{level}] {msg}"
-    
-    # Console
-    if level == "ERROR":
-        print(f"❌ {msg}")
-    elif level == "SUCCESS":
-        print(f"✅ {msg}")
-    elif level == "WARNING":
-        print(f"⚠️ {msg}")
-    else:
-        print(f"ℹ️ {msg}")
-    
-    # File
-    try:
-        with open(LOG_FILE, 'a') as f:
-            f.write(log_entry + '\n')
-    except:
-        pass
+REQUESTS_PER_MINUTE = 15  # Gemini free-tier quota
+MAX_CONCURRENT_BATCHES = 3  # Batches (API calls) in flight at once
+PROGRESS_FILE = 'seo_generation_progress.ndjson'  # Append-only, one record per line
+LEGACY_PROGRESS_FILE = 'seo_generation_progress.json'  # Old whole-file format, imported once
 
 # ============================================================================
 # PROGRESS TRACKING
 # ============================================================================
 
 def load_progress() -> Dict:
-    """Load progress from file to enable resuming."""
-    if os.path.exists(PROGRESS_FILE):
-        try:
-            with open(PROGRESS_FILE, 'r') as f:
-                return json.load(f)
-        except:
-            pass
-    return {
-        'processed': [],
-        'failed': [],
+    """
+    Replay the progress log to enable resuming.
+
+    Each line is either a run header ({"started_at", "total"}) or a product
+    record ({"id", "status"}); the latest record for a product wins.
+    """
+    progress = {
+        'processed': set(),
+        'failed': set(),
         'total': 0,
         'started_at': None,
-        'last_batch': 0
     }
-
-def save_progress(progress: Dict):
-    """Save progress to file."""
+    if not os.path.exists(PROGRESS_FILE):
+        if os.path.exists(LEGACY_PROGRESS_FILE):
+            import_legacy_progress(progress)
+        return progress
+    
+    try:
+        with open(PROGRESS_FILE, 'rb') as f:
+            for line in f:
+                try:
+                    record = orjson.loads(line)
+                except orjson.JSONDecodeError:
+                    continue  # e.g. a line cut short by a crash
+                
+                if 'id' not in record:
+                    progress.update(record)
+                elif record.get('status') == 'ok':
+                    progress['processed'].add(record['id'])
+                    progress['failed'].discard(record['id'])
+                else:
+                    progress['failed'].add(record['id'])
+                    progress['processed'].discard(record['id'])
+    except OSError as e:
+        log_message(f"Failed to load progress: {e}", "WARNING")
+    return progress
+
+def import_legacy_progress(progress: Dict):
+    """Carry the old single-JSON progress file over into a freshly compacted log."""
+    try:
+        with open(LEGACY_PROGRESS_FILE, 'rb') as f:
+            legacy = orjson.loads(f.read())
+        progress['processed'].update(legacy.get('processed', []))
+        progress['failed'].update(set(legacy.get('failed', [])) - progress['processed'])
+        progress['total'] = legacy.get('total', 0)
+        progress['started_at'] = legacy.get('started_at')
+        compact_progress(progress)
+        log_message(f"Imported {len(progress['processed'])} processed ids from {LEGACY_PROGRESS_FILE}", "INFO")
+    except (OSError, orjson.JSONDecodeError) as e:
+        log_message(f"Could not import {LEGACY_PROGRESS_FILE}: {e}", "WARNING")
+
+def compact_progress(progress: Dict):
+    """Rewrite the log as one header plus one record per product, atomically (temp file + os.replace)."""
+    records = [{'started_at': progress['started_at'], 'total': progress['total']}]
+    records += [{'id': pid, 'status': 'ok'} for pid in progress['processed']]
+    records += [{'id': pid, 'status': 'failed'} for pid in progress['failed']]
+    tmp = PROGRESS_FILE + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(b''.join(orjson.dumps(record) + b'\n' for record in records))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, PROGRESS_FILE)
+
+def save_progress(records: List[Dict]):
+    """Append records to the progress log, one JSON object per line."""
     try:
-        with open(PROGRESS_FILE, 'w') as f:
-            json.dump(progress, f, indent=2)
+        with open(PROGRESS_FILE, 'ab') as f:
+            f.write(b''.join(orjson.dumps(record) + b'\n' for record in records))
     except Exception as e:
         log_message(f"Failed to save progress: {e}", "WARNING")
 
 # ============================================================================
-# SEO CONTENT GENERATION
+# GENERATION
 # ============================================================================
 
-class SEOContentGenerator:
-    """Generates SEO-optimized product content using Gemini AI."""
-    
-    def __init__(self, api_key: str):
-        if not api_key:
-            log_message("GOOGLE_API_KEY not found in .env file", "ERROR")
-            log_message("Create a .env file with: GOOGLE_API_KEY='your-key-here'", "ERROR")
-            sys.exit(1)
-        
-        self.api_key = api_key
-        self.model = None
-        self.call_count = 0
-        self.setup_genai()
-    
-    def setup_genai(self):
-        """Configure Google Generative AI."""
-        try:
-            genai.configure(api_key=self.api_key)
-            self.model = genai.GenerativeModel(model_name='gemini-2.5-flash')
-            log_message("Connected to Gemini API", "SUCCESS")
-        except Exception as e:
-            log_message(f"Failed to connect to Gemini API: {e}", "ERROR")
-            sys.exit(1)
-    
-    def generate_batch_names(self, products_data: List[Dict]) -> List[Optional[str]]:
-        """
-        Generate SEO-optimized product names for multiple products.
-        
-        SEO considerations:
-        - Include brand and model
-        - Include key specs (processor, RAM, storage)
-        - Format: Brand Model (spec1, spec2, spec3)
-        - Natural language (no special characters or pipes)
-        """
-        
-        product_list = "\n".join([
-            f"{i+1}. {p['current_name']}"
-            for i, p in enumerate(products_data)
-        ])
-        
-        prompt = f"""Rewrite these product names for maximum SEO performance and user clarity.
-
-CURRENT NAMES:
-{product_list}
-
-For EACH name, create a better version using this EXACT format:
-[Brand] [Model] with [CPU/Processor] ([Specifications separated by commas])
-
-Key requirements:
-1. Start with brand and model name
-2. Include "with" before the processor/CPU name
-3. Put all specs inside parentheses, separated by commas
-4. ONLY include specs that are clearly specified in the original name - do NOT include specs if they're not mentioned
-5. Common specs to include (if present): Processor, GPU (if applicable), RAM, Storage, Display, Warranty, Battery, etc.
-6. If a spec is missing or not mentioned, skip it completely
-7. Example: "MSI Thin 15 B12VE with Intel i5 12450H Processor (RTX 4050 6GB, 8GB Ram, 512 GB SSD, 15.6" FHD 144Hz display, 2 Year warranty)"
-8. Example for incomplete spec: "Dell XPS 13 with Intel i7 (16GB RAM, 512GB SSD)" - warranty and display not included if not specified
-
-Output EXACTLY as:
-1. [new name]
-2. [new name]
-3. [new name]
-
-Start with "1." - nothing before it."""
-
-        try:
-            response = self.model.generate_content(prompt)
-            self.call_count += 1
-            
-            names = self._parse_batch_response(response.text, len(products_data))
-            log_message(f"Generated {len([n for n in names if n])} names", "SUCCESS")
-            return names
-        
-        except Exception as e:
-            log_message(f"Name generation failed: {e}", "ERROR")
-            return [None] * len(products_data)
-    
-    def generate_batch_descriptions(self, products_data: List[Dict]) -> List[Optional[str]]:
-        """
-        Generate SEO-optimized product descriptions.
-        
-        SEO considerations:
-        - Include primary keyword (product name/type)
-        - Natural keyword density
-        - 80-120 words (optimal for SERP snippets)
-        - Focus on benefits, not just specs
-        - Include differentiators
-        """
-        
-        product_list = "\n".join([
-            f"{i+1}. {p['name']} | Brand: {p['brand']} | Type: {p['category']}"
-            for i, p in enumerate(products_data)
-        ])
-        
-        prompt = f"""Write compelling, SEO-optimized product descriptions.
-
-PRODUCTS:
-{product_list}
-
-For EACH description:
-1. Write 2-3 sentences (80-120 words)
-2. Start with product name/type (include primary keyword)
-3. Focus on BENEFITS and key differentiators, not just specs
-4. Use natural language with related keywords
-5. Include performance/value proposition
-6. Make it unique - not generic or templated
-7. Professional but conversational tone
-8. NO markdown, NO special formatting
-
-Example: "The [Product] is a powerful [category] designed for [use case]. With [key feature], it delivers [benefit]. Perfect for [target user]."
-
-Output EXACTLY as:
-1. [description 1]
-2. [description 2]
-3. [description 3]
-
-Start with "1." - nothing before it."""
-
-        try:
-            response = self.model.generate_content(prompt)
-            self.call_count += 1
-            
-            descriptions = self._parse_batch_response(response.text, len(products_data))
-            log_message(f"Generated {len([d for d in descriptions if d])} descriptions", "SUCCESS")
-            return descriptions
-        
-        except Exception as e:
-            log_message(f"Description generation failed: {e}", "ERROR")
-            return [None] * len(products_data)
-    
-    def generate_batch_metas(self, products_data: List[Dict]) -> List[Optional[str]]:
-        """
-        Generate SEO meta descriptions.
-        
-        SEO considerations:
-        - Exactly 155-160 characters (Google SERP limit)
-        - Include product name + brand + key benefit
-        - Compelling call-to-action
-        - No truncation of important info
-        """
-        
-        product_list = "\n".join([
-            f"{i+1}. {p['name']} | {p['brand']}"
-            for i, p in enumerate(products_data)
-        ])
-        
-        prompt = f"""Write compelling SEO meta descriptions (155-160 chars each).
-
-PRODUCTS:
-{product_list}
-
-For EACH meta description:
-1. Must be EXACTLY 155-160 characters
-2. Include product name and brand naturally
-3. Highlight main benefit or key feature
-4. Make it clickable from Google search results
-5. Include relevant keywords naturally
-6. NO markdown, NO special characters
-7. NO truncation - complete sentences
-8. We are Digitech Enterprises, a trusted retailer.
-
-Format EXACTLY as:
-1. [meta description]
-2. [meta description]
-3. [meta description]
-
-Character count must be 155-160 for each.
-Start with "1." - nothing before it."""
-
-        try:
-            response = self.model.generate_content(prompt)
-            self.call_count += 1
-            
-            metas = self._parse_batch_response(response.text, len(products_data))
-            
-            # Enforce character limit
-            for i, meta in enumerate(metas):
-                if meta and len(meta) > 160:
-                    metas[i] = meta[:157] + "..."
-            
-            log_message(f"Generated {len([m for m in metas if m])} meta descriptions", "SUCCESS")
-            return metas
-        
-        except Exception as e:
-            log_message(f"Meta generation failed: {e}", "ERROR")
-            return [None] * len(products_data)
-    
-    def _parse_batch_response(self, text: str, expected_count: int) -> List[Optional[str]]:
-        """Parse numbered list response from API."""
-        items = []
-        lines = text.strip().split('\n')
-        
-        for line in lines:
-            line = line.strip()
-            # Look for numbered items: "1. ", "2. ", etc.
-            if line and len(line) > 2 and line[0].isdigit():
-                # Find the period
-                if '.' in line:
-                    content = line.split('.', 1)[1].strip()
-                    if content:
-                        items.append(content)
-        
-        # Pad with None if not enough items parsed
-        while len(items) < expected_count:
-            items.append(None)
-        
-        return items[:expected_count]
+def batch_data(products) -> List[Dict]:
+    """Prompt inputs for a batch, read from the ORM before anything runs on the event loop."""
+    return [
+        {
+            'name': p.name,
+            'brand': p.brand.name if p.brand else 'Brand',
+            'category': p.category.name if p.category else 'Category'
+        }
+        for p in products
+    ]
 
 # ============================================================================
 # MAIN SCRIPT
@@ -346,8 +182,15 @@ Examples:
                        help='Maximum products to process')
     parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
                        help=f'Products per API call (default: {BATCH_SIZE})')
+    parser.add_argument('--concurrency', type=int, default=MAX_CONCURRENT_BATCHES,
+                       help=f'Batches processed in parallel (default: {MAX_CONCURRENT_BATCHES})')
+    parser.add_argument('--rpm', type=int, default=REQUESTS_PER_MINUTE,
+                       help=f'Max API requests per minute (default: {REQUESTS_PER_MINUTE})')
     parser.add_argument('--resume', action='store_true', 
                        help='Resume from last interrupted run')
+    parser.add_argument('--force', action='store_true',
+                       help='Also regenerate products that already have SEO content')
+    add_cache_arguments(parser)
     
     args = parser.parse_args()
     
@@ -372,18 +215,29 @@ Examples:
     # SETUP
     # ========================================================================
     
-    generator = SEOContentGenerator(API_KEY)
+    generator = AsyncGenerator(API_KEY, model_name='gemini-2.5-flash', rpm=args.rpm, **cache_options(args))
+    runner = AsyncRunner()
+    log_message("Connected to Gemini API", "SUCCESS")
     progress = load_progress()
-    processed_ids = set(progress['processed'])
-    failed_ids = set(progress['failed'])
+    processed_ids = progress['processed']
+    failed_ids = progress['failed']
     
     # Get products
-    query = Product.objects.all()
+    # Only the columns the prompts and the update need; rows are streamed per batch
+    query = Product.objects.select_related('category', 'brand').only(
+        'product_id', 'name', 'description', 'meta_description', 'brand__name', 'category__name'
+    )
     
     if args.category:
         query = query.filter(category__name__icontains=args.category)
         log_message(f"Filtering by category: {args.category}", "INFO")
     
+    if not args.force:
+        before = query.count()
+        query = exclude_optimized(query)
+        skipped = before - query.count()
+        log_message(f"Skipping {skipped} already-optimized products (use --force to include them)", "INFO")
+    
     # Exclude already processed
     query = query.exclude(product_id__in=processed_ids)
     query = query.exclude(product_id__in=failed_ids)
@@ -391,8 +245,7 @@ Examples:
     if args.limit:
         query = query[:args.limit]
     
-    products = list(query)
-    total = len(products)
+    total = query.count()
     
     # ========================================================================
     # DISPLAY STATS
@@ -406,15 +259,13 @@ Examples:
     
     # Calculate API calls
     batches = (total + args.batch_size - 1) // args.batch_size
-    api_calls = batches * 3  # names + descriptions + metas
+    api_calls = batches  # one JSON call returns names, descriptions and metas
     
     print(f"\n📞 API CALLS:")
     print(f"   • Expected total: {api_calls} calls")
-    print(f"   • Name generation: {batches} calls")
-    print(f"   • Description generation: {batches} calls")
-    print(f"   • Meta generation: {batches} calls")
+    print(f"   • One call per batch (names + descriptions + metas)")
     print(f"   • Cost estimate: <$0.02 or FREE (free tier, 15 calls/min)")
-    print(f"   • Time estimate: {max(api_calls // 15 + 1, 5)}-10 minutes\n")
+    print(f"   • Time estimate: ~{api_calls // args.rpm + 1} minutes at {args.rpm} calls/min\n")
     
     if total == 0:
         log_message("No products to process!", "WARNING")
@@ -427,33 +278,21 @@ Examples:
     if args.dry_run:
         log_message("Running in DRY-RUN mode (preview only)", "INFO")
         
-        sample = products[0]
+        sample = query[0]
         print(f"\n{'='*80}")
-        print(f"📦 SAMPLE PRODUCT: {sample.name[:60]}...")
+        print(f"📦 SAMPLE PRODUCT: {pad(sample.name, 60)}")
         print(f"{'='*80}\n")
         
         # Generate samples
         log_message("Generating sample content...", "INFO")
-        time.sleep(1)
         
-        # Name
-        names = generator.generate_batch_names([{'current_name': sample.name}])
-        time.sleep(DELAY_BETWEEN_CALLS)
+        names, descriptions, metas = runner.run(generator.generate_batch_all_async(batch_data([sample])))
         
         print(f"🔴 CURRENT NAME ({len(sample.name)} chars):")
         print(f"   {sample.name}\n")
         print(f"🟢 NEW NAME ({len(names[0]) if names[0] else 0} chars):")
         print(f"   {names[0]}\n")
         
-        # Description
-        desc_data = [{
-            'name': sample.name,
-            'brand': sample.brand.name if sample.brand else 'Brand',
-            'category': sample.category.name if sample.category else 'Category'
-        }]
-        descriptions = generator.generate_batch_descriptions(desc_data)
-        time.sleep(DELAY_BETWEEN_CALLS)
-        
         current_desc_preview = sample.description[:150] if sample.description else "N/A"
         if sample.description and len(sample.description) > 150:
             current_desc_preview += "..."
@@ -463,14 +302,6 @@ Examples:
         print(f"🟢 NEW DESCRIPTION ({len(descriptions[0]) if descriptions[0] else 0} chars):")
         print(f"   {descriptions[0]}\n")
         
-        # Meta
-        meta_data = [{
-            'name': names[0] if names[0] else sample.name,
-            'brand': sample.brand.name if sample.brand else 'Brand'
-        }]
-        metas = generator.generate_batch_metas(meta_data)
-        time.sleep(DELAY_BETWEEN_CALLS)
-        
         print(f"🔴 CURRENT META ({len(sample.meta_description) if sample.meta_description else 0} chars):")
         print(f"   {sample.meta_description if sample.meta_description else 'N/A'}\n")
         print(f"🟢 NEW META ({len(metas[0]) if metas[0] else 0} chars):")
@@ -508,95 +339,87 @@ Examples:
     print("🔄 PROCESSING STARTED")
     print(f"{'='*80}\n")
     
-    progress['started_at'] = datetime.now().isoformat()
-    progress['total'] = total
-    save_progress(progress)
+    save_progress([{'started_at': datetime.now().isoformat(), 'total': total}])
     
     updated_count = 0
     failed_count = 0
     start_time = time.time()
     
-    # Process in batches
-    for batch_start in range(0, total, args.batch_size):
-        batch_end = min(batch_start + args.batch_size, total)
-        batch = products[batch_start:batch_end]
-        batch_num = (batch_start // args.batch_size) + 1
-        total_batches = (total + args.batch_size - 1) // args.batch_size
-        
-        print(f"[Batch {batch_num:3d}/{total_batches}] Processing {len(batch)} products...", 
-              end=" ", flush=True)
+    total_batches = (total + args.batch_size - 1) // args.batch_size
+    
+    def finish_batch(future, batch_num, batch):
+        """Save one completed batch and record it in the progress file."""
+        nonlocal updated_count, failed_count
+        label = f"[Batch {batch_num:3d}/{total_batches}]"
         
         try:
-            # Generate names
-            names_data = [{'current_name': p.name} for p in batch]
-            new_names = generator.generate_batch_names(names_data)
-            time.sleep(DELAY_BETWEEN_CALLS)
-            
-            # Generate descriptions
-            desc_data = [
-                {
-                    'name': new_names[i] if new_names[i] else p.name,
-                    'brand': p.brand.name if p.brand else 'Brand',
-                    'category': p.category.name if p.category else 'Category'
-                }
-                for i, p in enumerate(batch)
-            ]
-            new_descriptions = generator.generate_batch_descriptions(desc_data)
-            time.sleep(DELAY_BETWEEN_CALLS)
-            
-            # Generate metas
-            meta_data = [
-                {
-                    'name': new_names[i] if new_names[i] else p.name,
-                    'brand': p.brand.name if p.brand else 'Brand'
-                }
-                for i, p in enumerate(batch)
-            ]
-            new_metas = generator.generate_batch_metas(meta_data)
-            time.sleep(DELAY_BETWEEN_CALLS)
+            new_names, new_descriptions, new_metas = future.result()
             
-            # Update database
-            batch_success = 0
-            for i, product in enumerate(batch):
-                try:
-                    if new_names[i]:
-                        product.name = new_names[i]
-                    if new_descriptions[i]:
-                        product.description = new_descriptions[i]
-                    if new_metas[i]:
-                        product.meta_description = new_metas[i]
-                    
-                    product.save()
-                    processed_ids.add(product.product_id)
-                    batch_success += 1
-                    updated_count += 1
-                except Exception as e:
-                    log_message(f"Failed to save {product.name}: {e}", "ERROR")
-                    failed_ids.add(product.product_id)
-                    failed_count += 1
-            
-            print(f"✅ {batch_success}/{len(batch)} saved ({updated_count}/{total} total)")
+            # Update database (one UPDATE round-trip for the whole batch)
+            to_update = []
+            for product, name, description, meta in zip(batch, new_names, new_descriptions, new_metas):
+                if name:
+                    product.name = name
+                if description:
+                    product.description = description
+                if meta:
+                    product.meta_description = meta
+                if name or description or meta:
+                    to_update.append(product)
             
-            # Save progress
-            progress['processed'] = list(processed_ids)
-            progress['failed'] = list(failed_ids)
-            progress['last_batch'] = batch_num
-            save_progress(progress)
+            try:
+                with transaction.atomic():
+                    Product.objects.bulk_update(to_update, ['name', 'description', 'meta_description'], batch_size=100)
+                # Products with no generated field (e.g. a failed or unparseable call) stay 'failed' so --resume retries them
+                saved = {p.product_id for p in to_update}
+                updated_count += len(saved)
+                failed_count += len(batch) - len(saved)
+            except Exception as e:
+                log_message(f"{label} Failed to save batch: {e}", "ERROR", event="save_failed", batch=batch_num)
+                failed_count += len(batch)
+                saved = set()
         
         except Exception as e:
-            print(f"❌ Batch error: {str(e)[:50]}")
+            log_message(f"{label} Batch error: {str(e)[:50]}", "ERROR", event="batch_failed", batch=batch_num)
             failed_count += len(batch)
-            for p in batch:
-                failed_ids.add(p.product_id)
+            saved = set()
+        
+        # Save progress (only this batch's IDs are written)
+        save_progress([
+            {'id': p.product_id, 'status': 'ok' if p.product_id in saved else 'failed', 'batch': batch_num}
+            for p in batch
+        ])
+        update_progress(pbar, generator, updated_count, failed_count, start_time, n=len(batch))
+    
+    # Process in batches, keeping up to --concurrency of them in flight.
+    # Generation runs on the runner's event loop; saves happen here, in order of completion.
+    in_flight = {}
+    with progress_bar(total) as pbar:
+        batches = chunked(query.iterator(chunk_size=200), args.batch_size)
+        for batch_num, batch in enumerate(batches, 1):
+            future = runner.submit(generator.generate_batch_all_async(batch_data(batch)))
+            in_flight[future] = (batch_num, batch)
             
-            progress['failed'] = list(failed_ids)
-            save_progress(progress)
+            if len(in_flight) >= args.concurrency:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    finish_batch(future, *in_flight.pop(future))
+        
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                finish_batch(future, *in_flight.pop(future))
     
     # ========================================================================
     # SUMMARY
     # ========================================================================
     
+    runner.close()
+    if updated_count:
+        bump_catalogue_version()  # bulk_update sends no post_save, so expire the cached catalogue responses here
     elapsed = time.time() - start_time
+    log_message("Run finished", "INFO", event="run_done", ok=updated_count, fail=failed_count,
+                calls=generator.call_count, cache_hits=generator.cache.hits, elapsed=round(elapsed, 1))
     
     print(f"\n{'='*80}")
     print("✨ COMPLETE!")
@@ -605,6 +428,7 @@ Examples:
     print(f"   ✅ Successfully updated: {updated_count} products")
     print(f"   ❌ Failed: {failed_count} products")
     print(f"   📞 API calls used: {generator.call_count}")
+    print(f"   ♻️  Cache hits: {generator.cache.hits}")
     print(f"   ⏱️  Time taken: {elapsed:.1f} seconds ({elapsed/60:.1f} minutes)")
     print(f"   💰 Estimated cost: <$0.02 or FREE")
     print(f"   ⏰ Completed: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
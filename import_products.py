@@ -1,8 +1,12 @@
 import os
+import asyncio
+import aiohttp
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import django
 import time
-from bs4 import BeautifulSoup
+from selectolax.parser import HTMLParser
 from django.core.files.base import ContentFile
 from django.utils.text import slugify
 
@@ -11,6 +15,14 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ecommerce.settings')
 django.setup()
 
 from shop.models import Product, Category, Brand, ProductImage, ProductAttribute
+from shop.cache import bump_catalogue_version
+
+NBSP_TO_SPACE = str.maketrans('\xa0', ' ')
+
+def cell_text(cell):
+    """Join a cell's stripped text nodes with spaces (handles nested <a>/<span>)."""
+    texts = cell.text(separator="\n", strip=True).split("\n")
+    return " ".join(filter(None, texts)).translate(NBSP_TO_SPACE)
 
 def parse_specs_table(html_content):
     """
@@ -20,21 +32,104 @@ def parse_specs_table(html_content):
     if not html_content:
         return specs
     
-    soup = BeautifulSoup(html_content, 'html.parser')
-    rows = soup.find_all('tr')
+    tree = HTMLParser(html_content)
     
-    for row in rows:
-        cells = row.find_all(['td', 'th'])
+    for row in tree.css('tr'):
+        cells = [node for node in row.iter() if node.tag in ('td', 'th')]
         if len(cells) >= 2:
-            # Clean up the key and value (handling nested tags like <a> or <span>)
-            key = cells[0].get_text(" ", strip=True).replace('\xa0', ' ')
-            value = cells[1].get_text(" ", strip=True).replace('\xa0', ' ')
+            # Clean up the key and value
+            key = cell_text(cells[0])
+            value = cell_text(cells[1])
             
             if key and value:
                 specs[key] = value
                 
     return specs
 
+IMAGE_CONCURRENCY = 16  # Simultaneous image downloads
+SAVE_EVERY = 25  # Fetched products upserted per batch
+
+async def download(session, sem, url):
+    """Fetch one image, returning its bytes or None on failure."""
+    async with sem:
+        try:
+            async with session.get(url, timeout=aiohttp.ClientTimeout(total=10)) as resp:
+                if resp.status == 200:
+                    return await resp.read()
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            pass
+    return None
+
+async def download_images(urls, headers):
+    """Download all image URLs concurrently, bounded by IMAGE_CONCURRENCY."""
+    sem = asyncio.Semaphore(IMAGE_CONCURRENCY)
+    async with aiohttp.ClientSession(headers=headers) as session:
+        return await asyncio.gather(*[download(session, sem, url) for url in urls])
+
+def save_products(pending, created_ids, headers):
+    """Upsert one batch of (product, slug, details), then refresh its attributes and fetch missing images."""
+    Product.objects.bulk_create(
+        [product for product, _, _ in pending],
+        update_conflicts=True,
+        unique_fields=['product_id'],
+        update_fields=[
+            'seo_friendly_name', 'price', 'old_price', 'category', 'brand',
+            'is_available', 'description', 'meta_description', 'trending',
+        ],
+        batch_size=200,
+    )
+
+    # HANDLE ATTRIBUTES (FROM THE 'SPECIFICATION' FIELD)
+    # Your API example shows a field called 'specification'
+    attributes = []
+    refreshed = []
+    for product, slug, details in pending:
+        parsed_specs = parse_specs_table(details.get('specification', ''))
+        if parsed_specs:
+            refreshed.append(product.product_id)
+            attributes.extend(
+                ProductAttribute(product=product, attribute=attr_key, value=attr_val)
+                for attr_key, attr_val in parsed_specs.items()
+            )
+        else:
+            print(f"--- No technical specifications found for {slug}.")
+            if product.product_id in created_ids:
+                # bulk_create skips the post_save receiver that gives new products their category defaults
+                attributes.extend(
+                    ProductAttribute(product=product, attribute=predef.key, value=predef.default_value or '')
+                    for predef in product.category.predefined_attributes.all()
+                )
+
+    # Refresh attributes
+    ProductAttribute.objects.filter(product_id__in=refreshed).delete()
+    ProductAttribute.objects.bulk_create(attributes, batch_size=500)
+    created_ids.difference_update(product.product_id for product, _, _ in pending)  # exist now; a relisting is an update
+    print(f"--- Filled {len(attributes)} attributes for {len(pending)} products.")
+    bump_catalogue_version()  # the upsert and attribute bulk_create send no post_save
+
+    # Queue images for products that have none yet
+    with_images = set(
+        ProductImage.objects.filter(product_id__in=[p.product_id for p, _, _ in pending])
+        .values_list('product_id', flat=True)
+    )
+    image_jobs = [
+        (product, f"{slug}-{i}.webp", img_data['image'])
+        for product, slug, details in pending
+        if product.product_id not in with_images
+        for i, img_data in enumerate(details.get('images', []))
+        if img_data.get('image')
+    ]
+
+    # Handle Images
+    if image_jobs:
+        print(f"\nDownloading {len(image_jobs)} images...")
+        contents = asyncio.run(download_images([url for _, _, url in image_jobs], headers))
+        for (product, filename, _), content in zip(image_jobs, contents):
+            if content:
+                p_img = ProductImage(product=product)
+                p_img.image.save(filename, ContentFile(content), save=True)
+
+
 def run_import():
     LIST_URL = "https://admin.itti.com.np/api/product-list?type=category&type_slug=laptops-by-brands&per_page=400"
     DETAIL_BASE_URL = "https://admin.itti.com.np/api/product-detail/"
@@ -44,20 +139,35 @@ def run_import():
         "Accept": "application/json"
     }
 
+    # One pooled keep-alive session for the list and every detail request
+    session = requests.Session()
+    session.headers.update(headers)
+    adapter = HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=Retry(total=3, backoff_factor=0.5))
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
     print("--- Starting Import ---")
-    list_response = requests.get(LIST_URL, headers=headers)
+    list_response = session.get(LIST_URL)
     if list_response.status_code != 200:
         return
 
     products_list = list_response.json().get('data', [])
     category_obj, _ = Category.objects.get_or_create(name="Laptops")
 
+    # Existing products are matched by name, as update_or_create did; their
+    # primary keys let the bulk upsert below update them in place.
+    existing_ids = dict(Product.objects.values_list('name', 'product_id'))
+    taken_ids = set(existing_ids.values())
+    created_ids = set()  # ids first inserted by this run
+    brands = {}
+    pending = {}  # product_id -> (product, slug, details); a repeated name keeps its last listing
+
     for item in products_list:
         slug = item.get('slug')
         print(f"\nFetching: {slug}")
         
         try:
-            detail_response = requests.get(f"{DETAIL_BASE_URL}{slug}", headers=headers, timeout=15)
+            detail_response = session.get(f"{DETAIL_BASE_URL}{slug}", timeout=15)
             if detail_response.status_code != 200:
                 continue
             
@@ -70,60 +180,50 @@ def run_import():
 
         # Handle Brand
         brand_name = item['name'].split(' ')[0]
-        brand_obj, _ = Brand.objects.get_or_create(name=brand_name)
+        if brand_name not in brands:
+            brands[brand_name], _ = Brand.objects.get_or_create(name=brand_name)
+
+        # Same id scheme as Product.save(), which bulk_create bypasses
+        product_id = existing_ids.get(item['name'])
+        if not product_id:
+            product_id = original_id = slugify(slug or item['name'])
+            num = 1
+            while product_id in taken_ids:
+                product_id = f"{original_id}-{num}"
+                num += 1
+            existing_ids[item['name']] = product_id
+            taken_ids.add(product_id)
+            created_ids.add(product_id)
 
-        # Update Product
         price_data = item.get('price', {})
-        product, created = Product.objects.update_or_create(
+        product = Product(
+            product_id=product_id,
             name=item['name'],
-            defaults={
-                'seo_friendly_name': slug,
-                'price': price_data.get('selling_price', 0),
-                'old_price': price_data.get('mark_price', 0),
-                'category': category_obj,
-                'brand': brand_obj,
-                'stock': price_data.get('stock', 10),
-                'is_available': price_data.get('in_stock', True),
-                'description': details.get('summary', '') or details.get('description', ''),
-                'meta_description': details.get('meta_description', ''),
-                'trending': details.get('is_new', False),
-            }
+            seo_friendly_name=slug,
+            price=price_data.get('selling_price', 0),
+            old_price=price_data.get('mark_price', 0),
+            category=category_obj,
+            brand=brands[brand_name],
+            is_available=price_data.get('in_stock', True),
+            description=details.get('summary', '') or details.get('description', ''),
+            meta_description=details.get('meta_description', ''),
+            trending=details.get('is_new', False),
         )
+        pending.pop(product_id, None)
+        pending[product_id] = (product, slug, details)
 
-        # HANDLE ATTRIBUTES (FROM THE 'SPECIFICATION' FIELD)
-        # Your API example shows a field called 'specification'
-        html_spec = details.get('specification', '')
-        parsed_specs = parse_specs_table(html_spec)
-        
-        if parsed_specs:
-            # Refresh attributes
-            ProductAttribute.objects.filter(product=product).delete()
-            for attr_key, attr_val in parsed_specs.items():
-                ProductAttribute.objects.create(
-                    product=product,
-                    attribute=attr_key,
-                    value=attr_val
-                )
-            print(f"--- Filled {len(parsed_specs)} attributes.")
-        else:
-            print("--- No technical specifications found.")
-
-        # Handle Images
-        all_imgs = details.get('images', [])
-        if not product.images.exists():
-            for i, img_data in enumerate(all_imgs):
-                img_url = img_data.get('image')
-                if img_url:
-                    try:
-                        resp = requests.get(img_url, timeout=10)
-                        if resp.status_code == 200:
-                            p_img = ProductImage(product=product)
-                            p_img.image.save(f"{slug}-{i}.webp", ContentFile(resp.content), save=True)
-                    except:
-                        pass
+        # Save as we go so a failure late in the run keeps the batches already fetched
+        if len(pending) >= SAVE_EVERY:
+            save_products(list(pending.values()), created_ids, headers)
+            pending.clear()
 
         time.sleep(0.5)
 
+    session.close()
+
+    if pending:
+        save_products(list(pending.values()), created_ids, headers)
+
     print("\n✅ Process Finished!")
 
 if __name__ == "__main__":
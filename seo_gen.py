@@ -0,0 +1,916 @@
+#!/usr/bin/env python
+"""
+Shared library for the Gemini-powered SEO scripts.
+
+generate_descriptions_advanced.py, generate_descriptions_optimized.py,
+generate_metas_only.py and generate_seo_complete.py are thin argparse
+wrappers around the generators defined here. Importing this module runs
+django.setup() once, so scripts import it before touching any model.
+"""
+
+import os
+import re
+import json
+import time
+import atexit
+import queue
+import shelve
+import logging
+import logging.handlers
+import hashlib
+import asyncio
+import threading
+from functools import partial
+from typing import Any, Callable, List, Dict, Optional
+
+
+import django
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ecommerce.settings')
+django.setup()
+
+import google.generativeai as genai
+from django.db.models.functions import Length
+from google.api_core.exceptions import ResourceExhausted
+from cachetools import LRUCache
+from pythonjsonlogger.json import JsonFormatter
+from tqdm import tqdm
+from wcwidth import wcswidth, wcwidth
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+DEFAULT_MODEL = 'gemini-1.5-flash'
+DEFAULT_RPM = 120  # API requests per minute; bursts are allowed up to this many
+RATE_LIMIT_RETRIES = 3  # Retries after a 429, each at a decayed rate
+LOG_FILE = 'seo_generation.jsonl'  # One JSON object per line, rotated at 10 MB
+DEFAULT_LRU_SIZE = 4096  # Prompt responses kept in memory per run
+DEFAULT_CACHE_FILE = 'seo_prompt_cache'  # shelve file reused across runs
+
+# Gemini JSON mode: one {name, description, meta_description} object per product
+BATCH_ALL_CONFIG = {
+    'response_mime_type': 'application/json',
+    'response_schema': {
+        'type': 'array',
+        'items': {
+            'type': 'object',
+            'properties': {
+                'name': {'type': 'string'},
+                'description': {'type': 'string'},
+                'meta_description': {'type': 'string'},
+            },
+            'required': ['name', 'description', 'meta_description'],
+        },
+    },
+}
+
+def string_list_config(count: int) -> Dict:
+    """Gemini JSON mode config for an array of exactly `count` strings."""
+    return {
+        'response_mime_type': 'application/json',
+        'response_schema': {
+            'type': 'array',
+            'items': {'type': 'string'},
+            'min_items': count,
+            'max_items': count,
+        },
+    }
+
+BATCH_ALL_INSTRUCTIONS = """Optimize e-commerce products for SEO. For EACH product in the user's list write a new name, a description and a meta description.
+
+NAME - use this EXACT format:
+[Brand] [Model] with [CPU/Processor] ([Specifications separated by commas])
+- ONLY include specs clearly stated in the original name; skip anything missing
+- Common specs (if present): Processor, GPU, RAM, Storage, Display, Warranty, Battery
+- Example: "MSI Thin 15 B12VE with Intel i5 12450H Processor (RTX 4050 6GB, 8GB Ram, 512 GB SSD, 15.6" FHD 144Hz display, 2 Year warranty)"
+- Example for incomplete spec: "Dell XPS 13 with Intel i7 (16GB RAM, 512GB SSD)"
+
+DESCRIPTION:
+- 2-3 sentences (80-120 words), starting with the product name/type
+- Focus on BENEFITS and key differentiators, not just specs
+- Natural language with related keywords, unique, professional but conversational
+- NO markdown, NO special formatting
+
+META DESCRIPTION:
+- EXACTLY 155-160 characters, complete sentences
+- Include product name and brand naturally, highlight the main benefit
+- Make it clickable from Google search results
+- NO markdown, NO special characters
+- We are Digitech Enterprises, a trusted retailer."""
+
+# Batch prompt templates; only {product_list} and {count} vary per call
+BATCH_NAMES_PROMPT = """Rewrite these product names for maximum SEO performance and user clarity.
+
+CURRENT NAMES:
+{product_list}
+
+For EACH name, create a better version using this EXACT format:
+[Brand] [Model] with [CPU/Processor] ([Specifications separated by commas])
+
+Key requirements:
+1. Start with brand and model name
+2. Include "with" before the processor/CPU name
+3. Put all specs inside parentheses, separated by commas
+4. ONLY include specs that are clearly specified in the original name - do NOT include specs if they're not mentioned
+5. Common specs to include (if present): Processor, GPU (if applicable), RAM, Storage, Display, Warranty, Battery, etc.
+6. If a spec is missing or not mentioned, skip it completely
+7. Example: "MSI Thin 15 B12VE with Intel i5 12450H Processor (RTX 4050 6GB, 8GB Ram, 512 GB SSD, 15.6" FHD 144Hz display, 2 Year warranty)"
+8. Example for incomplete spec: "Dell XPS 13 with Intel i7 (16GB RAM, 512GB SSD)" - warranty and display not included if not specified
+
+Return a JSON array of {count} strings, one per product, in the same order."""
+
+BATCH_DESCRIPTIONS_PROMPT = """Write compelling, SEO-optimized product descriptions.
+
+PRODUCTS:
+{product_list}
+
+For EACH description:
+1. Write 2-3 sentences (80-120 words)
+2. Start with product name/type (include primary keyword)
+3. Focus on BENEFITS and key differentiators, not just specs
+4. Use natural language with related keywords
+5. Include performance/value proposition
+6. Make it unique - not generic or templated
+7. Professional but conversational tone
+8. NO markdown, NO special formatting
+
+Example: "The [Product] is a powerful [category] designed for [use case]. With [key feature], it delivers [benefit]. Perfect for [target user]."
+
+Return a JSON array of {count} strings, one per product, in the same order."""
+
+BATCH_METAS_PROMPT = """Write compelling SEO meta descriptions (155-160 chars each).
+
+PRODUCTS:
+{product_list}
+
+For EACH meta description:
+1. Must be EXACTLY 155-160 characters
+2. Include product name and brand naturally
+3. Highlight main benefit or key feature
+4. Make it clickable from Google search results
+5. Include relevant keywords naturally
+6. NO markdown, NO special characters
+7. NO truncation - complete sentences
+8. We are Digitech Enterprises, a trusted retailer.
+
+Character count must be 155-160 for each.
+Return a JSON array of {count} strings, one per product, in the same order."""
+
+BATCH_KEYWORDS_PROMPT = """Generate SEO keywords for these products.
+
+PRODUCTS:
+{product_list}
+
+Requirements for EACH:
+- 5-8 keywords separated by commas
+- Relevant to product and category
+- Include brand and product type
+- Focus on customer search terms
+- NO parentheses or special formatting
+
+Each string is "keyword1, keyword2, keyword3, ..."
+Return a JSON array of {count} strings, one per product, in the same order."""
+
+BATCH_ALL_PROMPT = """PRODUCTS:
+{product_list}
+
+Return a JSON array with exactly {count} objects, in the same order as the products."""
+
+def _extract_json_array(text: str) -> Optional[str]:
+    """The outermost [...] span of text, e.g. from a response wrapped in a code fence."""
+    start, end = text.find('['), text.rfind(']')
+    return text[start:end + 1] if 0 <= start < end else None
+
+# Numbered-list item ("1. text") in batch responses; [^\S\n] is whitespace within a line
+_ITEM_RE = re.compile(r'^[^\S\n]*(\d+)\.[^\S\n]*(\S.*?)[^\S\n]*$', re.MULTILINE)
+
+# ============================================================================
+# LOGGING
+# ============================================================================
+
+class TqdmHandler(logging.Handler):
+    """Console handler that prints through tqdm.write so an active progress bar stays pinned."""
+
+    ICONS = {'ERROR': '❌', 'SUCCESS': '✅', 'WARNING': '⚠️'}
+
+    def emit(self, record):
+        status = getattr(record, 'status', record.levelname)
+        tqdm.write(f"{self.ICONS.get(status, 'ℹ️')} {record.getMessage()}")
+
+
+PROGRESS_EVENTS = {'batch_done'}
+
+def _console_filter(record) -> bool:
+    # Progress events feed dashboards via the JSON file; the bar already shows them
+    return getattr(record, 'event', None) not in PROGRESS_EVENTS
+
+
+logger = logging.getLogger('seo_gen')
+logger.setLevel(logging.INFO)
+logger.propagate = False
+
+_file_handler = logging.handlers.RotatingFileHandler(LOG_FILE, maxBytes=10_000_000, backupCount=5, delay=True)
+_file_handler.setFormatter(JsonFormatter(
+    '%(asctime)s %(levelname)s %(message)s',
+    rename_fields={'asctime': 'ts', 'levelname': 'level'},
+))
+
+_console_handler = TqdmHandler()
+_console_handler.addFilter(_console_filter)
+
+# Callers only enqueue; file and console I/O run on the listener's thread
+_log_queue = queue.SimpleQueue()
+logger.addHandler(logging.handlers.QueueHandler(_log_queue))
+_log_listener = logging.handlers.QueueListener(_log_queue, _file_handler, _console_handler, respect_handler_level=True)
+_log_listener.start()
+atexit.register(_log_listener.stop)  # Flushes whatever is still queued
+
+
+def log_message(msg: str, level: str = "INFO", event: str = "message", **fields):
+    """
+    Log to the console and, as structured JSON, to LOG_FILE.
+
+    level is INFO, SUCCESS, WARNING or ERROR (SUCCESS is logged at INFO with
+    status=SUCCESS). Extra keyword fields are written as JSON keys.
+    """
+    log_level = logging.INFO if level == "SUCCESS" else getattr(logging, level, logging.INFO)
+    logger.log(log_level, msg, extra={'event': event, 'status': level, **fields})
+
+# ============================================================================
+# QUERYSETS
+# ============================================================================
+
+def exclude_optimized(query, descriptions: bool = True):
+    """
+    Drop products whose SEO fields already look generated: a 140-160 char
+    meta description and, when descriptions is True, an 80+ char description.
+    """
+    query = query.annotate(meta_len=Length('meta_description'))
+    if not descriptions:
+        return query.exclude(meta_len__gte=140, meta_len__lte=160)
+    query = query.annotate(desc_len=Length('description'))
+    return query.exclude(meta_len__gte=140, meta_len__lte=160, desc_len__gte=80)
+
+def chunked(iterable, size: int):
+    """Yield lists of up to `size` items, e.g. batches from queryset.iterator()."""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+# ============================================================================
+# PROGRESS
+# ============================================================================
+
+def pad(text: str, width: int) -> str:
+    """Truncate/pad text to exactly `width` terminal cells (CJK and emoji count as two)."""
+    text = ' '.join(text.split())
+    if wcswidth(text) > width:
+        cells = 0
+        for i, char in enumerate(text):
+            cells += max(wcwidth(char), 0)
+            if cells > width - 1:
+                text = text[:i] + '…'
+                break
+    return text + ' ' * (width - max(wcswidth(text), 0))
+
+def progress_bar(total: int, desc: str = 'SEO gen', unit: str = 'prod') -> tqdm:
+    """Live progress bar with ETA; print per-item status through pbar.write()."""
+    return tqdm(total=total, desc=desc, unit=unit)
+
+def update_progress(pbar: tqdm, generator, ok: int, fail: int, start_time: float, n: int = 1):
+    """Advance the bar by n products, refresh its ok/fail/rpm readout and log a batch_done event."""
+    elapsed = max(time.time() - start_time, 1e-6)
+    rpm = generator.call_count / elapsed * 60
+    pbar.update(n)
+    pbar.set_postfix(ok=ok, fail=fail, rpm=f"{rpm:.1f}")
+    logger.info('batch_done', extra={
+        'event': 'batch_done', 'size': n, 'done': pbar.n, 'total': pbar.total,
+        'ok': ok, 'fail': fail, 'calls': generator.call_count,
+        'cache_hits': generator.cache.hits, 'rpm': round(rpm, 1), 'elapsed': round(elapsed, 1),
+    })
+
+# ============================================================================
+# GEMINI CLIENT
+# ============================================================================
+
+_configured_key = None
+_models = {}
+
+def get_model(api_key: str, model_name: str = DEFAULT_MODEL, system_instruction: Optional[str] = None):
+    """
+    Return a process-wide GenerativeModel for model_name.
+
+    genai.configure() throws away the SDK's cached clients (and with them the
+    open gRPC channels), so it only runs when the API key changes. All
+    generators in the process then share the same connections.
+
+    With system_instruction, the static instructions are attached to the
+    model, so each prompt carries only its dynamic part.
+    """
+    global _configured_key
+    if api_key != _configured_key:
+        genai.configure(api_key=api_key)
+        _configured_key = api_key
+        _models.clear()
+
+    key = (model_name, system_instruction)
+    if key not in _models:
+        _models[key] = genai.GenerativeModel(model_name, system_instruction=system_instruction)
+    return _models[key]
+
+# ============================================================================
+# RATE LIMITING
+# ============================================================================
+
+class RateLimiter:
+    """
+    Token bucket allowing bursts of up to `rpm` calls, refilled at rpm/60 per
+    second; callers only sleep once the bucket is empty. backoff() decays the
+    rate after a 429 and each successful call recovers 1 rpm of it, up to the
+    configured cap. rpm=None disables limiting.
+    """
+
+    MIN_RPM = 1
+
+    def __init__(self, rpm: Optional[float] = DEFAULT_RPM):
+        self.max_rpm = rpm
+        self.rpm = rpm
+        self._tokens = float(rpm or 0)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Take a token (possibly borrowed from the future); return seconds to wait for it."""
+        if not self.rpm:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            rate = self.rpm / 60
+            self._tokens = min(self.rpm, self._tokens + (now - self._updated) * rate) - 1
+            self._updated = now
+            return -self._tokens / rate if self._tokens < 0 else 0.0
+
+    def wait(self):
+        delay = self._reserve()
+        if delay:
+            time.sleep(delay)
+
+    async def wait_async(self):
+        delay = self._reserve()
+        if delay:
+            await asyncio.sleep(delay)
+
+    def backoff(self, factor: float = 0.8):
+        """Slow down after a 429 and drop any banked burst."""
+        if not self.rpm:
+            return
+        with self._lock:
+            self.rpm = max(self.MIN_RPM, self.rpm * factor)
+            self._tokens = min(self._tokens, 0.0)
+        log_message(f"Rate limited, slowing to {self.rpm:.1f} requests/min", "WARNING", event="rate_limited", rpm=round(self.rpm, 1))
+
+    def recover(self):
+        if self.rpm and self.rpm < self.max_rpm:
+            with self._lock:
+                self.rpm = min(self.max_rpm, self.rpm + 1)
+
+# ============================================================================
+# CACHING
+# ============================================================================
+
+def parsed_ok(result) -> bool:
+    """True when a (parsed) response is complete: not empty, and no missing item in any list of it."""
+    if isinstance(result, (list, tuple)):
+        return all(parsed_ok(item) for item in result)
+    return bool(result)
+
+
+class PromptCache:
+    """
+    Prompt -> response cache with two tiers: a thread-safe in-memory LRU for
+    the process lifetime, in front of an optional shelve file on disk so
+    re-runs, retries and dry-runs don't pay for the same prompt twice.
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_LRU_SIZE, path: Optional[str] = None):
+        self.memory = LRUCache(maxsize=maxsize) if maxsize else None
+        self.path = path
+        self.hits = 0
+        self._disk = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(model_name: str, prompt: str, generation_config: Optional[Dict] = None,
+            system_instruction: Optional[str] = None) -> str:
+        config = json.dumps(generation_config, sort_keys=True) if generation_config else ""
+        raw = f"{model_name}\n{config}\n{system_instruction or ''}\n{prompt}"
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _open_disk(self):
+        # Opened lazily so --help and empty runs don't create the file
+        if self._disk is None and self.path:
+            self._disk = shelve.open(self.path)
+            atexit.register(self.close)
+        return self._disk
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            if self.memory is not None:
+                value = self.memory.get(key)
+                if value is not None:
+                    self.hits += 1
+                    return value
+
+            disk = self._open_disk()
+            if disk is not None:
+                value = disk.get(key)
+                if value is not None:
+                    self.hits += 1
+                    if self.memory is not None:
+                        self.memory[key] = value
+                    return value
+        return None
+
+    def set(self, key: str, value: Optional[str]):
+        if value is None:
+            return
+        with self._lock:
+            if self.memory is not None:
+                self.memory[key] = value
+            disk = self._open_disk()
+            if disk is not None:
+                disk[key] = value
+
+    def close(self):
+        with self._lock:
+            if self._disk is not None:
+                self._disk.close()
+                self._disk = None
+
+def add_cache_arguments(parser):
+    """Add the cache CLI options shared by all generator scripts."""
+    parser.add_argument('--lru-size', type=int, default=DEFAULT_LRU_SIZE,
+                        help=f'In-memory prompt cache entries, 0 to disable (default: {DEFAULT_LRU_SIZE})')
+    parser.add_argument('--cache-file', type=str, default=DEFAULT_CACHE_FILE,
+                        help=f'On-disk prompt cache shared across runs (default: {DEFAULT_CACHE_FILE})')
+    parser.add_argument('--no-disk-cache', action='store_true',
+                        help='Always call the API for prompts not seen in this run')
+
+def cache_options(args) -> Dict:
+    """Generator keyword arguments for the options added by add_cache_arguments()."""
+    return {
+        'lru_size': args.lru_size,
+        'cache_file': None if args.no_disk_cache else args.cache_file,
+    }
+
+# ============================================================================
+# ASYNC
+# ============================================================================
+
+class AsyncRunner:
+    """
+    Runs coroutines on one long-lived event loop in a background thread.
+
+    The scripts stay synchronous (the Django ORM refuses to run inside an
+    event loop) while AsyncGenerator calls share a single loop, so the
+    Gemini grpc.aio channel is created once and reused.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+    def submit(self, coro):
+        """Schedule the coroutine on the background loop and return a concurrent.futures.Future."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro):
+        """Block until the coroutine finishes on the background loop and return its result."""
+        return self.submit(coro).result()
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# ============================================================================
+# GENERATORS
+# ============================================================================
+
+class BaseGenerator:
+    """Generates SEO content for one product at a time (one API call per field)."""
+
+    def __init__(self, api_key: str, model_name: str = DEFAULT_MODEL, rpm: Optional[float] = DEFAULT_RPM,
+                 lru_size: int = DEFAULT_LRU_SIZE, cache_file: Optional[str] = None):
+        self.api_key = api_key
+        self.model_name = model_name
+        self.model = None
+        self.call_count = 0
+        self.limiter = RateLimiter(rpm)
+        self.cache = PromptCache(lru_size, cache_file)
+        self.setup_genai()
+
+    def setup_genai(self):
+        """Attach the shared Gemini model (configures the SDK on first use)."""
+        self.model = get_model(self.api_key, self.model_name)
+
+    def model_for(self, system_instruction: Optional[str] = None):
+        """The shared model, or one carrying the given static instructions."""
+        if system_instruction is None:
+            return self.model
+        return get_model(self.api_key, self.model_name, system_instruction)
+
+    def generate_content(self, prompt: str, generation_config: Optional[Dict] = None,
+                         system_instruction: Optional[str] = None, parse: Optional[Callable[[Optional[str]], Any]] = None):
+        """
+        Send one prompt and return the stripped response text, or None on error.
+
+        With parse, return parse(text) instead. Either way the text is only
+        cached once it is complete (see parsed_ok), so a truncated or malformed
+        answer is requested again on the next run rather than replayed.
+        """
+        key = self.cache.key(self.model_name, prompt, generation_config, system_instruction)
+        cached = self.cache.get(key)
+        if cached is not None:
+            result = parse(cached) if parse else cached
+            if parsed_ok(result):
+                return result
+
+        return self._cache_parsed(key, self._call_model(prompt, generation_config, system_instruction), parse)
+
+    def _cache_parsed(self, key: str, text: Optional[str], parse: Optional[Callable[[Optional[str]], Any]]):
+        result = parse(text) if parse else text
+        if text is not None and parsed_ok(result):
+            self.cache.set(key, text)
+        return result
+
+    def _call_model(self, prompt: str, generation_config: Optional[Dict],
+                    system_instruction: Optional[str]) -> Optional[str]:
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            self.limiter.wait()
+            try:
+                model = self.model_for(system_instruction)
+                response = model.generate_content(prompt, generation_config=generation_config)
+                self.call_count += 1
+                self.limiter.recover()
+                return response.text.strip()
+            except ResourceExhausted as e:
+                if attempt == RATE_LIMIT_RETRIES:
+                    log_message(f"Generation failed: {e}", "ERROR")
+                    return None
+                self.limiter.backoff()
+            except Exception as e:
+                log_message(f"Generation failed: {e}", "ERROR")
+                return None
+
+    # ------------------------------------------------------------------------
+    # Prompts
+    # ------------------------------------------------------------------------
+
+    def _description_prompt(self, product_name: str, category: str, brand: str, specs: Optional[str] = None) -> str:
+        specs_context = f"Key specs: {specs}" if specs else ""
+
+        return f"""Generate a unique, compelling product description for an e-commerce website.
+
+Product Name: {product_name}
+Category: {category}
+Brand: {brand}
+{specs_context}
+
+Requirements:
+- Write 2-3 sentences (50-100 words)
+- Focus on benefits and key features
+- SEO-friendly but natural
+- Unique - not generic or template-like
+- Professional but conversational
+- Include performance/value proposition
+- NO markdown, plain text only
+
+Output ONLY the description, nothing else."""
+
+    def _meta_description_prompt(self, product_name: str, description: str, brand: str) -> str:
+        return f"""Generate a concise meta description for search engines.
+
+Product: {product_name}
+Brand: {brand}
+Description: {description}
+
+Requirements:
+- MUST be 150-160 characters
+- Include main keywords naturally
+- Compelling to click from search results
+- Include brand if possible
+- NO markdown
+
+Output ONLY the meta description, nothing else."""
+
+    def _meta_keywords_prompt(self, product_name: str, category: str, brand: str) -> str:
+        return f"""Generate SEO keywords for this product.
+
+Product: {product_name}
+Category: {category}
+Brand: {brand}
+
+Requirements:
+- 5-8 relevant keywords
+- Separated by commas
+- Focus on what customers search for
+- Include brand name
+- Include category
+- Include specific product type
+
+Output ONLY the keywords, nothing else."""
+
+    def _finish_meta(self, meta: Optional[str]) -> Optional[str]:
+        # Truncate if too long
+        if meta and len(meta) > 160:
+            meta = meta[:157] + "..."
+        return meta
+
+    # ------------------------------------------------------------------------
+    # Single-product generation
+    # ------------------------------------------------------------------------
+
+    def generate_description(self, product_name: str, category: str, brand: str, specs: Optional[str] = None) -> Optional[str]:
+        """Generate a unique product description."""
+        return self.generate_content(self._description_prompt(product_name, category, brand, specs))
+
+    def generate_meta_description(self, product_name: str, description: str, brand: str) -> Optional[str]:
+        """Generate SEO meta description (155 chars)."""
+        return self._finish_meta(self.generate_content(self._meta_description_prompt(product_name, description, brand)))
+
+    def generate_meta_keywords(self, product_name: str, category: str, brand: str) -> Optional[str]:
+        """Generate SEO keywords."""
+        return self.generate_content(self._meta_keywords_prompt(product_name, category, brand))
+
+
+class BatchedGenerator(BaseGenerator):
+    """Generates content for several products per API call (numbered-list prompts)."""
+
+    # ------------------------------------------------------------------------
+    # Prompts
+    # ------------------------------------------------------------------------
+
+    def _batch_names_prompt(self, products_data: List[Dict]) -> str:
+        product_list = "\n".join(
+            f"{i+1}. {p['current_name']}"
+            for i, p in enumerate(products_data)
+        )
+
+        return BATCH_NAMES_PROMPT.format(product_list=product_list, count=len(products_data))
+
+    def _batch_descriptions_prompt(self, products_data: List[Dict]) -> str:
+        product_list = "\n".join(
+            f"{i+1}. {p['name']} | Brand: {p['brand']} | Type: {p['category']}"
+            for i, p in enumerate(products_data)
+        )
+
+        return BATCH_DESCRIPTIONS_PROMPT.format(product_list=product_list, count=len(products_data))
+
+    def _batch_metas_prompt(self, products_data: List[Dict]) -> str:
+        # A description snippet, when supplied, gives the model more to work with
+        product_list = "\n".join(
+            f"{i+1}. {p['name']} | {p['brand']}"
+            + (f" | {p['description'][:100]}..." if p.get('description') else "")
+            for i, p in enumerate(products_data)
+        )
+
+        return BATCH_METAS_PROMPT.format(product_list=product_list, count=len(products_data))
+
+    def _batch_keywords_prompt(self, products_data: List[Dict]) -> str:
+        product_list = "\n".join(
+            f"{i+1}. {p['name']} ({p['category']})"
+            for i, p in enumerate(products_data)
+        )
+
+        return BATCH_KEYWORDS_PROMPT.format(product_list=product_list, count=len(products_data))
+
+    def _batch_all_prompt(self, products_data: List[Dict]) -> str:
+        # Static rules live in BATCH_ALL_INSTRUCTIONS (sent as a system instruction)
+        product_list = "\n".join(
+            f"{i+1}. {p['name']} | Brand: {p['brand']} | Type: {p['category']}"
+            for i, p in enumerate(products_data)
+        )
+
+        return BATCH_ALL_PROMPT.format(product_list=product_list, count=len(products_data))
+
+    def _parse_batch_all_response(self, text: Optional[str], expected_count: int):
+        """Parse the JSON-mode response into (names, descriptions, metas) lists."""
+        try:
+            items = json.loads(text) if text else []
+        except ValueError:
+            log_message("Could not parse JSON batch response", "WARNING")
+            items = []
+        if not isinstance(items, list):
+            items = []
+
+        items = (items + [{}] * expected_count)[:expected_count]
+        fields = [
+            [(item.get(field) or None) if isinstance(item, dict) else None for item in items]
+            for field in ('name', 'description', 'meta_description')
+        ]
+        names, descriptions, metas = fields
+        return names, descriptions, self._finish_metas(metas)
+
+    def _parse_list_response(self, text: Optional[str], expected_count: int) -> List[Optional[str]]:
+        """
+        Parse a JSON-mode array of strings. If the model wrapped or broke the
+        JSON, retry on the outermost [...] and finally fall back to the
+        numbered-list parser.
+        """
+        if not text:
+            return [None] * expected_count
+
+        for candidate in (text, _extract_json_array(text)):
+            if not candidate:
+                continue
+            try:
+                items = json.loads(candidate)
+            except ValueError:
+                continue
+            if isinstance(items, list):
+                items = [(str(item).strip() or None) if item is not None else None for item in items]
+                return (items + [None] * expected_count)[:expected_count]
+
+        return self._parse_batch_response(text, expected_count)
+
+    def _parse_batch_response(self, text: Optional[str], expected_count: int) -> List[Optional[str]]:
+        """Parse numbered list response from API."""
+        if not text:
+            return [None] * expected_count
+
+        # Items are matched by their number, so skipped or reordered lines stay aligned
+        matches = {}
+        for number, content in _ITEM_RE.findall(text):
+            matches.setdefault(int(number), content)
+
+        return [matches.get(i + 1) for i in range(expected_count)]
+
+    def _finish_metas(self, metas: List[Optional[str]]) -> List[Optional[str]]:
+        # Enforce character limit (slicing is by code point, so multi-byte characters stay whole)
+        return [meta[:157] + "..." if meta and len(meta) > 160 else meta for meta in metas]
+
+    # ------------------------------------------------------------------------
+    # Batch generation
+    # ------------------------------------------------------------------------
+
+    def generate_batch_names(self, products_data: List[Dict]) -> List[Optional[str]]:
+        """
+        Generate SEO-optimized product names.
+
+        Args:
+            products_data: List of dicts with 'current_name'
+        """
+        return self.generate_content(self._batch_names_prompt(products_data), string_list_config(len(products_data)),
+                                     parse=partial(self._parse_list_response, expected_count=len(products_data)))
+
+    def generate_batch_descriptions(self, products_data: List[Dict]) -> List[Optional[str]]:
+        """
+        Generate SEO-optimized product descriptions.
+
+        Args:
+            products_data: List of dicts with 'name', 'brand', 'category'
+        """
+        return self.generate_content(self._batch_descriptions_prompt(products_data), string_list_config(len(products_data)),
+                                     parse=partial(self._parse_list_response, expected_count=len(products_data)))
+
+    def generate_batch_metas(self, products_data: List[Dict]) -> List[Optional[str]]:
+        """
+        Generate SEO meta descriptions (160 chars max).
+
+        Args:
+            products_data: List of dicts with 'name', 'brand' and optionally 'description'
+        """
+        return self._finish_metas(self.generate_content(
+            self._batch_metas_prompt(products_data), string_list_config(len(products_data)),
+            parse=partial(self._parse_list_response, expected_count=len(products_data)),
+        ))
+
+    def generate_batch_all(self, products_data: List[Dict]):
+        """
+        Generate names, descriptions and metas in a single JSON-mode call.
+
+        Args:
+            products_data: List of dicts with 'name', 'brand', 'category'
+
+        Returns:
+            (names, descriptions, metas), each a list aligned with products_data
+        """
+        return self.generate_content(self._batch_all_prompt(products_data), BATCH_ALL_CONFIG, BATCH_ALL_INSTRUCTIONS,
+                                     parse=partial(self._parse_batch_all_response, expected_count=len(products_data)))
+
+    def generate_batch_keywords(self, products_data: List[Dict]) -> List[Optional[str]]:
+        """
+        Generate SEO keywords.
+
+        Args:
+            products_data: List of dicts with 'name', 'category'
+        """
+        return self.generate_content(self._batch_keywords_prompt(products_data), string_list_config(len(products_data)),
+                                     parse=partial(self._parse_list_response, expected_count=len(products_data)))
+
+
+class AsyncGenerator(BatchedGenerator):
+    """
+    Adds `_async` variants so independent calls can be awaited concurrently.
+
+    generate_content_async() goes through the SDK's grpc.aio client (no
+    thread per call). The client is created lazily on the shared model, so
+    drive every call from one loop (AsyncRunner) to keep a single
+    multiplexed channel.
+
+    The rpm limiter is shared by all in-flight calls (e.g. pass rpm=15 on the
+    Gemini free tier).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Cache key -> task for requests still awaiting the API, so identical
+        # concurrent prompts share one call instead of racing the cache.
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    async def generate_content_async(self, prompt: str, generation_config: Optional[Dict] = None,
+                                     system_instruction: Optional[str] = None,
+                                     parse: Optional[Callable[[Optional[str]], Any]] = None):
+        """Async counterpart of generate_content()."""
+        key = self.cache.key(self.model_name, prompt, generation_config, system_instruction)
+        cached = self.cache.get(key)
+        if cached is not None:
+            result = parse(cached) if parse else cached
+            if parsed_ok(result):
+                return result
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._call_model_async(key, prompt, generation_config, system_instruction))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shielded so one cancelled waiter doesn't cancel the shared call
+        return self._cache_parsed(key, await asyncio.shield(task), parse)
+
+    async def _call_model_async(self, key: str, prompt: str, generation_config: Optional[Dict],
+                                system_instruction: Optional[str]) -> Optional[str]:
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            await self.limiter.wait_async()
+            try:
+                model = self.model_for(system_instruction)
+                response = await model.generate_content_async(prompt, generation_config=generation_config)
+                self.call_count += 1
+                self.limiter.recover()
+                return response.text.strip()
+            except ResourceExhausted as e:
+                if attempt == RATE_LIMIT_RETRIES:
+                    log_message(f"Generation failed: {e}", "ERROR")
+                    return None
+                self.limiter.backoff()
+            except Exception as e:
+                log_message(f"Generation failed: {e}", "ERROR")
+                return None
+
+    async def generate_description_async(self, product_name: str, category: str, brand: str, specs: Optional[str] = None) -> Optional[str]:
+        return await self.generate_content_async(self._description_prompt(product_name, category, brand, specs))
+
+    async def generate_meta_description_async(self, product_name: str, description: str, brand: str) -> Optional[str]:
+        return self._finish_meta(await self.generate_content_async(self._meta_description_prompt(product_name, description, brand)))
+
+    async def generate_meta_keywords_async(self, product_name: str, category: str, brand: str) -> Optional[str]:
+        return await self.generate_content_async(self._meta_keywords_prompt(product_name, category, brand))
+
+    async def generate_batch_names_async(self, products_data: List[Dict]) -> List[Optional[str]]:
+        return await self.generate_content_async(self._batch_names_prompt(products_data),
+                                                 string_list_config(len(products_data)),
+                                                 parse=partial(self._parse_list_response, expected_count=len(products_data)))
+
+    async def generate_batch_descriptions_async(self, products_data: List[Dict]) -> List[Optional[str]]:
+        return await self.generate_content_async(self._batch_descriptions_prompt(products_data),
+                                                 string_list_config(len(products_data)),
+                                                 parse=partial(self._parse_list_response, expected_count=len(products_data)))
+
+    async def generate_batch_metas_async(self, products_data: List[Dict]) -> List[Optional[str]]:
+        return self._finish_metas(await self.generate_content_async(
+            self._batch_metas_prompt(products_data), string_list_config(len(products_data)),
+            parse=partial(self._parse_list_response, expected_count=len(products_data)),
+        ))
+
+    async def generate_batch_all_async(self, products_data: List[Dict]):
+        return await self.generate_content_async(self._batch_all_prompt(products_data), BATCH_ALL_CONFIG,
+                                                 BATCH_ALL_INSTRUCTIONS,
+                                                 parse=partial(self._parse_batch_all_response, expected_count=len(products_data)))
+
+    async def generate_batch_keywords_async(self, products_data: List[Dict]) -> List[Optional[str]]:
+        return await self.generate_content_async(self._batch_keywords_prompt(products_data),
+                                                 string_list_config(len(products_data)),
+                                                 parse=partial(self._parse_list_response, expected_count=len(products_data)))
@@ -1,7 +1,7 @@
 from django.contrib import admin
 from .models import Product, Comment, Repliess, ProductImage, Rating, Brand,Series, Category, SubCategory, ProductAttribute, PredefinedAttribute, Color, Variant
 from import_export.admin import ImportExportModelAdmin
-from .resources import ProductResource, ProductAttributeResource, ProductImageResource, BrandResource, SeriesResource, CategoryResource, SubCategoryResource, PredefinedAttributeResource
+from .resources import ProductResource, ProductAttributeResource, ProductImageResource, BrandResource, SeriesResource, CategoryResource, SubCategoryResource, PredefinedAttributeResource, ColorResource, VariantResource
 # Register your models here.
 
 class ColorInline(admin.TabularInline):
@@ -10,7 +10,7 @@ class ColorInline(admin.TabularInline):
 
 class ColorAdmin(ImportExportModelAdmin,admin.ModelAdmin):
     model = Color
-    resource_class = ProductAttributeResource
+    resource_classes = [ColorResource]
 
 class VariantInline(admin.TabularInline):
     model = Variant
@@ -18,7 +18,7 @@ class VariantInline(admin.TabularInline):
 
 class VariantAdmin(ImportExportModelAdmin,admin.ModelAdmin):
     model = Variant
-    resource_class = ProductAttributeResource
+    resource_classes = [VariantResource]
 
 
 class ProductImageInline(admin.TabularInline):
@@ -27,7 +27,7 @@ class ProductImageInline(admin.TabularInline):
 
 class ProductImageAdmin(ImportExportModelAdmin,admin.ModelAdmin):
     model = ProductImage
-    resource_class = ProductImageResource
+    resource_classes = [ProductImageResource]
 
 class RatingInLine(admin.TabularInline):
     model = Rating
@@ -35,28 +35,28 @@ class RatingInLine(admin.TabularInline):
 
 class BrandAdmin(ImportExportModelAdmin,admin.ModelAdmin):
     model = Brand
-    resource_class = ProductAttributeResource
+    resource_classes = [BrandResource]
 
 class SeriesAdmin(ImportExportModelAdmin,admin.ModelAdmin):
     model = Series
-    resource_class = ProductAttributeResource
+    resource_classes = [SeriesResource]
 
 class CategoryAdmin(ImportExportModelAdmin,admin.ModelAdmin):
     model = Category
-    resource_class = ProductAttributeResource
+    resource_classes = [CategoryResource]
 
 class SubCategoryAdmin(ImportExportModelAdmin,admin.ModelAdmin):
     model = SubCategory
-    resource_class = ProductAttributeResource
+    resource_classes = [SubCategoryResource]
 
 class PredefinedAttributeAdmin(ImportExportModelAdmin,admin.ModelAdmin):
     model = PredefinedAttribute
-    resource_class = ProductAttributeResource
+    resource_classes = [PredefinedAttributeResource]
 
 
 class ProductAttributeAdmin(ImportExportModelAdmin,admin.ModelAdmin):
     model = ProductAttribute
-    resource_class = ProductAttributeResource
+    resource_classes = [ProductAttributeResource]
 
 class AttributeInline(admin.TabularInline):
     model = ProductAttribute
@@ -64,7 +64,10 @@ class AttributeInline(admin.TabularInline):
 
 class ProductsAdmin(ImportExportModelAdmin,admin.ModelAdmin):
     inlines = [AttributeInline, ColorInline, VariantInline,ProductImageInline, RatingInLine]
-    resource_class = ProductResource
+    resource_classes = [ProductResource]
+    list_display = ('name', 'brand', 'category', 'price')
+    list_select_related = ('brand', 'category')
+    list_per_page = 50
 
 
 admin.site.register(Product,ProductsAdmin)
@@ -1,4 +1,5 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class ShopConfig(AppConfig):
@@ -6,4 +7,6 @@ class ShopConfig(AppConfig):
     name = 'shop'
     def ready(self):
         import shop.signals
+        post_migrate.connect(shop.signals.create_search_indexes, sender=self)
+        post_migrate.connect(shop.signals.backfill_thumbnails, sender=self)
 
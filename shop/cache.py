@@ -0,0 +1,94 @@
+import hashlib
+import time
+from collections import defaultdict
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponseNotModified
+from django.utils.cache import patch_cache_control
+from rest_framework.response import Response
+
+# Bumped by the catalogue signals; part of every cached response key, so one incr invalidates them all
+CATALOGUE_VERSION_KEY = 'catalogue:version'
+
+
+def _version_seed():
+    # A lost key (Redis restart, eviction) restarts from the clock in ms rather than 1, so the new versions stay
+    # above every one already issued and ETags from before the loss never match again
+    return int(time.time() * 1000)
+
+
+def catalogue_version():
+    return cache.get_or_set(CATALOGUE_VERSION_KEY, _version_seed, None)
+
+
+def bump_catalogue_version():
+    try:
+        cache.incr(CATALOGUE_VERSION_KEY)
+    except ValueError:
+        cache.set(CATALOGUE_VERSION_KEY, _version_seed(), None)
+
+
+def request_digest(request, ignore=()):
+    """md5 of the request path and its query string, sorted so parameter order doesn't matter, minus ignore."""
+    query = urlencode(sorted((k, v) for k, v in request.GET.lists() if k not in ignore), doseq=True)
+    return hashlib.md5(f"{request.path}?{query}".encode()).hexdigest()
+
+
+def cache_catalogue_response(view_func):
+    """
+    Cache a GET view's response data for CATALOGUE_CACHE_SECONDS, keyed by path, canonicalized query string and
+    catalogue version. Responses carry an ETag on the same key and a public Cache-Control; a matching
+    If-None-Match gets a 304 without touching the cache or the database.
+    """
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        digest = request_digest(request)
+        version = catalogue_version()
+        etag = f'"{version}-{digest}"'
+        if etag in request.headers.get('If-None-Match', ''):
+            response = HttpResponseNotModified()
+        else:
+            key = f"catalogue:{version}:{digest}"
+            data = cache.get(key)
+            if data is not None:
+                response = Response(data)
+            else:
+                response = view_func(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+                cache.set(key, response.data, settings.CATALOGUE_CACHE_SECONDS)
+        response['ETag'] = etag
+        patch_cache_control(response, public=True, max_age=settings.CATALOGUE_CACHE_SECONDS, stale_while_revalidate=300)
+        return response
+    return wrapper
+
+# Per-process name -> ids tables for the small, nearly static lookup models (Category, Brand, ...).
+# Each table remembers the catalogue version it was loaded at and is reloaded once the version moves on, so a
+# change saved through any worker reaches every process.
+_lookup_tables = {}
+
+
+def lookup_ids(model, name):
+    """ids of model rows whose name equals name case-insensitively, like name__iexact but without a query."""
+    if not name:
+        return []
+    return _lookup_table(model).get(name.upper(), [])
+
+
+def lookup_ids_matching(model, pattern):
+    """ids of model rows whose upper-cased name pattern.search()es, like name__iregex but without a query."""
+    return [pk for row_name, pks in _lookup_table(model).items() if pattern.search(row_name) for pk in pks]
+
+
+def _lookup_table(model):
+    version = catalogue_version()
+    loaded = _lookup_tables.get(model)
+    if loaded is None or loaded[0] != version:
+        table = defaultdict(list)
+        for pk, row_name in model.objects.values_list('pk', 'name'):
+            table[row_name.upper()].append(pk)
+        loaded = _lookup_tables[model] = (version, table)
+    return loaded[1]
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from shop.models import Product, update_rating_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute every product's denormalized rating stats (run once after migrating, or after bulk rating imports)"
+
+    def handle(self, *args, **options):
+        product_ids = Product.objects.filter(ratings__isnull=False).values_list('pk', flat=True).distinct()
+        count = 0
+        for product_id in product_ids.iterator():
+            update_rating_stats(product_id)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f"Refreshed rating stats for {count} products"))
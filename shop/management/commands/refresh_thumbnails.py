@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from shop.cache import bump_catalogue_version
+from shop.models import Product, update_thumbnails
+
+
+class Command(BaseCommand):
+    help = "Recompute every product's stored thumbnail (run once after migrating, or after bulk image imports)"
+
+    def handle(self, *args, **options):
+        count = update_thumbnails(Product.objects.all())
+        bump_catalogue_version()  # a queryset update() sends no post_save
+        self.stdout.write(self.style.SUCCESS(f"Refreshed thumbnails for {count} products"))
@@ -1,16 +1,35 @@
+import re
 import sys
-from django.db import models
+from django.db import models, transaction, IntegrityError
 from userauth.models import User
 import uuid
+from datetime import date
 from django.conf import settings
 from django.utils import timezone
-from django.db.models import Avg
+from django.db.models import Avg, Count, Case, When, Value, F, Q, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Upper
+from django.contrib.postgres.search import SearchVectorField
 from django.utils.text import slugify
 from ckeditor.fields import RichTextField
 
 # Create your models here.
 
 
+SLUG_INSERT_ATTEMPTS = 5  # concurrent inserts racing for the same slug
+
+
+def next_free_slug(slug, taken):
+    """slug itself if free, else slug-N with N one past the highest suffix in taken."""
+    if slug not in taken:
+        return slug
+    suffix_re = re.compile(rf'{re.escape(slug)}-(\d+)')
+    suffixes = [int(m.group(1)) for m in map(suffix_re.fullmatch, taken) if m]
+    return f"{slug}-{max(suffixes, default=0) + 1}"
+
+
+def empty_ratings_hist():
+    return {str(star): 0 for star in range(1, 6)}
+
 
 class Product(models.Model):
     # product_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -38,20 +57,57 @@ class Product(models.Model):
     auction = models.BooleanField(default=False)
     auction_start_time = models.DateTimeField(null=True, blank=True)
     base_price = models.FloatField(null=True, blank=True)
+    # Rating stats, kept current by the Rating signals below so reads never aggregate
+    ratings_avg = models.FloatField(default=0)
+    ratings_total = models.PositiveIntegerField(default=0)
+    ratings_hist = models.JSONField(default=empty_ratings_hist)
+    # Storage name of the first image, kept current by the ProductImage signals below (nav search thumbnails)
+    thumbnail = models.CharField(max_length=255, blank=True, default='')
+    # Weighted tsvector over the product and its brand/category/sub-category/series names. Written by a PostgreSQL
+    # trigger (see shop.signals.create_search_indexes); stays NULL on other databases.
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        # Catalogue filters used by the list views (single FKs are already indexed by Django)
+        indexes = [
+            models.Index(fields=['category', 'brand', 'series']),  # leading columns also serve category+brand
+            models.Index(fields=['category', 'sub_category']),
+            # CatSearch / CatBrandSearch ordered by price: index range scan in price order, no sort node
+            models.Index(fields=['category', 'price']),
+            models.Index(fields=['category', 'brand', 'price']),
+            models.Index(fields=['deal', 'is_available', '-published_date']),  # deals, optionally only available ones, newest first
+            # Tagged lists (newest first) only ever read the flagged rows
+            models.Index(fields=['-published_date', '-product_id'], condition=Q(trending=True), name='product_trending_recent_idx'),
+            models.Index(fields=['-published_date', '-product_id'], condition=Q(best_seller=True), name='product_bestseller_recent_idx'),
+            models.Index(fields=['featured']),
+            models.Index(fields=['ratings_avg', 'product_id']),
+            # Keyset pagination orders (sort key, product_id) for a stable cursor
+            models.Index(fields=['price', 'product_id']),
+            models.Index(fields=['-published_date', '-product_id']),
+            models.Index(fields=['auction', 'auction_start_time']),
+        ]
 
     def __str__(self):
         return self.name
     def save(self, *args, **kwargs):
-        if not self.product_id:
-            # Use seo_friendly_name if it exists, otherwise use name
-            slug_source = self.seo_friendly_name if self.seo_friendly_name else self.name
-            self.product_id = slugify(slug_source)
-            original_id = self.product_id
-            num = 1
-            while Product.objects.filter(product_id=self.product_id).exists():
-                self.product_id = f"{original_id}-{num}"
-                num += 1
-        super().save(*args, **kwargs)
+        if self.product_id:
+            return super().save(*args, **kwargs)
+        # Use seo_friendly_name if it exists, otherwise use name
+        original_id = slugify(self.seo_friendly_name if self.seo_friendly_name else self.name)
+        self.product_id = original_id
+        # Insert optimistically; a taken slug makes the INSERT fail (instead of UPDATE-ing that row),
+        # and only then do we look up the "-N" variants and retry with the next suffix
+        kwargs['force_insert'] = True
+        for _ in range(SLUG_INSERT_ATTEMPTS - 1):
+            try:
+                with transaction.atomic():
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                taken = set(Product.objects.filter(product_id__startswith=original_id).values_list('product_id', flat=True))
+                if self.product_id not in taken:
+                    raise
+                self.product_id = next_free_slug(original_id, taken)
+        return super().save(*args, **kwargs)
 
 class Color(models.Model):
     name = models.CharField(max_length=50)
@@ -116,6 +172,10 @@ class Repliess(models.Model):
 class Brand(models.Model):
     name = models.CharField(max_length=50)
     category = models.ManyToManyField('Category', related_name='brands', null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(Upper('name'), name='brand_name_upper_idx')]  # name__iexact is UPPER(name) = UPPER(%s)
+
     def __str__(self):
         return self.name
     
@@ -123,17 +183,29 @@ class Series(models.Model):
     name = models.CharField(max_length=50)
     brand = models.ForeignKey(Brand, on_delete=models.CASCADE, related_name='series')
     category = models.ForeignKey('Category', on_delete=models.CASCADE, related_name='series')
+
+    class Meta:
+        indexes = [models.Index(Upper('name'), name='series_name_upper_idx')]  # name__iexact is UPPER(name) = UPPER(%s)
+
     def __str__(self):
         return self.name
 
 class Category(models.Model):
     name = models.CharField(max_length=50)
+
+    class Meta:
+        indexes = [models.Index(Upper('name'), name='category_name_upper_idx')]  # name__iexact is UPPER(name) = UPPER(%s)
+
     def __str__(self):
         return self.name
     
 class SubCategory(models.Model):
     name = models.CharField(max_length=50)
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='subcategories')
+
+    class Meta:
+        indexes = [models.Index(Upper('name'), name='subcategory_name_upper_idx')]  # name__iexact is UPPER(name) = UPPER(%s)
+
     def __str__(self):
         return self.name
     
@@ -175,7 +247,7 @@ class Emi(models.Model):
     monthlyInstallment = models.FloatField()
 
     def __str__(self):
-        return f"{self.product} - {self.duration} months"
+        return f"{self.product_id} - {self.emiDuration} months"
     
 
 # models.py
@@ -188,7 +260,7 @@ class PredefinedAttribute(models.Model):
         return f"{self.category.name} - {self.key}"
 
 # models.py
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 
 @receiver(post_save, sender=Product)
@@ -197,14 +269,52 @@ def create_default_attributes(sender, instance, created, **kwargs):
         return
     if created:
         # Get predefined attributes for the product's category
-        predefined_attrs = instance.category.predefined_attributes.all() if instance.category else []
-        for predef in predefined_attrs:
-            # Create a ProductAttribute with default value (if any)
-            ProductAttribute.objects.create(
+        predefined_attrs = list(instance.category.predefined_attributes.all()) if instance.category else []
+        # Create a ProductAttribute with default value (if any), all in one INSERT
+        ProductAttribute.objects.bulk_create([
+            ProductAttribute(
                 product=instance,
                 attribute=predef.key,
                 value=predef.default_value or ''
             )
+            for predef in predefined_attrs
+        ], batch_size=500)
+
+def update_rating_stats(product_id):
+    """Recompute a product's denormalized rating stats: one grouped count, one UPDATE."""
+    counts = Rating.objects.filter(product_id=product_id).values_list('rating').annotate(n=Count('pk')).order_by()
+    hist = empty_ratings_hist()
+    total = stars = 0
+    for rating, n in counts:
+        if str(rating) in hist:
+            hist[str(rating)] = n
+        total += n
+        stars += rating * n
+    Product.objects.filter(pk=product_id).update(
+        ratings_total=total,
+        ratings_avg=round(stars / total, 1) if total else 0,
+        ratings_hist=hist,
+    )
+
+@receiver(post_save, sender=Rating)
+@receiver(post_delete, sender=Rating)
+def refresh_rating_stats(sender, instance, **kwargs):
+    update_rating_stats(instance.product_id)
+
+def update_thumbnail(product_id):
+    """Point a product's thumbnail at its first image (by pk), or clear it."""
+    first = ProductImage.objects.filter(product_id=product_id).order_by('pk').values_list('image', flat=True).first()
+    Product.objects.filter(pk=product_id).update(thumbnail=first or '')
+
+def update_thumbnails(products):
+    """update_thumbnail for every product in a queryset, as one UPDATE; for writes that skip the signal."""
+    first = ProductImage.objects.filter(product_id=OuterRef('pk')).order_by('pk').values('image')[:1]
+    return products.update(thumbnail=Coalesce(Subquery(first), Value('')))
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def refresh_thumbnail(sender, instance, **kwargs):
+    update_thumbnail(instance.product_id)
 
 class PageStats(models.Model):
     visits = models.BigIntegerField(default=0)
@@ -217,5 +327,17 @@ class PageStats(models.Model):
             raise Exception('There is can be only one PageStats instance')
         return super(PageStats, self).save(*args, **kwargs)
 
+    @classmethod
+    def bump(cls):
+        """Count one visit with a single atomic UPDATE (restarting from 1 on a new day) and return the total."""
+        today = date.today()
+        updated = cls.objects.filter(pk=1).update(
+            visits=Case(When(last_reset=today, then=F('visits') + 1), default=Value(1)),
+            last_reset=today,
+        )
+        if not updated:
+            cls.objects.get_or_create(pk=1, defaults={'visits': 1})
+        return cls.objects.values_list('visits', flat=True).get(pk=1)
+
     def __str__(self):
         return f"Visits: {self.visits}"
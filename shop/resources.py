@@ -1,6 +1,12 @@
 from import_export import resources, fields
 from import_export.widgets import ForeignKeyWidget
-from .models import Product, ProductImage, ProductAttribute, Category, Brand, Series,SubCategory,PredefinedAttribute, Color, Variant
+from import_export.results import RowResult
+from django.utils.text import slugify
+from .cache import bump_catalogue_version
+from .models import next_free_slug, update_thumbnails, Product, ProductImage, ProductAttribute, Category, Brand, Series,SubCategory,PredefinedAttribute, Color, Variant
+
+# Row outcomes that wrote to the database
+WRITE_IMPORT_TYPES = (RowResult.IMPORT_TYPE_NEW, RowResult.IMPORT_TYPE_UPDATE, RowResult.IMPORT_TYPE_DELETE)
 
 class ProductResource(resources.ModelResource):
     product_id = fields.Field(attribute='product_id', column_name='product_id')
@@ -25,12 +31,21 @@ class ProductResource(resources.ModelResource):
         import_id_fields = ['product_id']  # <-- important!
         fields = ('product_id', 'name', 'category', 'brand', 'series', 'price', 'description', 'published_date')
 
+    def before_import(self, dataset, **kwargs):
+        # One query for every existing slug, so new rows get their product_id in memory
+        self._existing_slugs = set(Product.objects.values_list('product_id', flat=True))
+
+    def before_import_row(self, row, **kwargs):
+        if not row.get('product_id') and row.get('name'):
+            row['product_id'] = next_free_slug(slugify(row['name']), self._existing_slugs)
+            self._existing_slugs.add(row['product_id'])
+
 class ProductImageResource(resources.ModelResource):
     # Using ForeignKeyWidget for mapping the related Product model
     product = fields.Field(
-        column_name='product_name', 
-        attribute='product', 
-        widget=ForeignKeyWidget(Product, 'name')  # Ensuring 'name' is unique or use 'product_id' if it's more reliable
+        column_name='product_id',
+        attribute='product',
+        widget=ForeignKeyWidget(Product, 'product_id')  # primary key: unique, and an index lookup per row
     )
     # Use Field for custom handling of the image file
     image = fields.Field(attribute='image', column_name='image_file')
@@ -38,14 +53,25 @@ class ProductImageResource(resources.ModelResource):
     class Meta:
         model = ProductImage
         fields = ('id', 'product', 'image')
+        # Write rows with bulk_create/bulk_update in batches instead of one save() per row
+        use_bulk = True
+        batch_size = 1000
+        skip_diff = True
+
+    def after_import(self, dataset, result, **kwargs):
+        # Bulk writes skip ProductImage's post_save, so recompute the touched products' thumbnails here
+        product_ids = {pid for pid in dataset['product_id'] if pid} if 'product_id' in dataset.headers else set()
+        if product_ids:
+            update_thumbnails(Product.objects.filter(pk__in=product_ids))
+            bump_catalogue_version()
 
 
 class ProductAttributeResource(resources.ModelResource):
     # ForeignKeyWidget for referencing the product
     product = fields.Field(
-        column_name='product_name', 
-        attribute='product', 
-        widget=ForeignKeyWidget(Product, 'name')  # Same note as above for unique identifier
+        column_name='product_id',
+        attribute='product',
+        widget=ForeignKeyWidget(Product, 'product_id')  # primary key: unique, and an index lookup per row
     )
     # Mapping attributes and values
     attribute = fields.Field(attribute='attribute', column_name='attribute')
@@ -54,6 +80,15 @@ class ProductAttributeResource(resources.ModelResource):
     class Meta:
         model = ProductAttribute
         fields = ('id', 'product', 'attribute', 'value')
+        # Write rows with bulk_create/bulk_update in batches instead of one save() per row
+        use_bulk = True
+        batch_size = 1000
+        skip_diff = True
+
+    def after_import(self, dataset, result, **kwargs):
+        # Bulk writes skip ProductAttribute's post_save, so expire the cached catalogue responses here
+        if any(result.totals[import_type] for import_type in WRITE_IMPORT_TYPES):
+            bump_catalogue_version()
 
 class BrandResource(resources.ModelResource):
     class Meta:
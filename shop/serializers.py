@@ -1,6 +1,16 @@
 from rest_framework import serializers
 from .models import Product, Comment, Repliess, ProductImage, Rating, Series,Emi, ProductAttribute
 from django.contrib.auth.models import User
+from django.utils.encoding import iri_to_uri
+
+
+def media_url(request, path):
+    """Same as request.build_absolute_uri(f"/media/{path}"), with the /media/ base built once per request."""
+    base = getattr(request, '_media_base', None)
+    if base is None:
+        base = request._media_base = request.build_absolute_uri('/media/')
+    return base + iri_to_uri(str(path))
+
 
 class ReplySerializer(serializers.ModelSerializer):
     user = serializers.SerializerMethodField() #yo garexi i can define serializers for user by myself i.e. user ko kun attribute pathaune vanera
@@ -15,7 +25,7 @@ class ReplySerializer(serializers.ModelSerializer):
     def get_user_dp(self, obj):
         request = self.context.get('request')
         if obj.user.dp and request:
-            return request.build_absolute_uri(f"/media/{obj.user.dp}")
+            return media_url(request, obj.user.dp)
 
 
 
@@ -35,7 +45,7 @@ class CommentSerializer(serializers.ModelSerializer):
     def get_user_dp(self, obj):
         request = self.context.get('request')
         if obj.user.dp:
-            return request.build_absolute_uri(f"/media/{obj.user.dp}")
+            return media_url(request, obj.user.dp)
     
 class ProductImageSerializer(serializers.ModelSerializer):
     color_name = serializers.SerializerMethodField()
@@ -71,14 +81,31 @@ class RatingSerializer(serializers.ModelSerializer):
     def get_user_dp(self, obj):
         request = self.context.get('request')
         if obj.user.dp:
-            return request.build_absolute_uri(f"/media/{obj.user.dp}")
+            return media_url(request, obj.user.dp)
         
 class ProductAttributeSerializer(serializers.ModelSerializer):
     class Meta:
         model = ProductAttribute
         fields = ['attribute', 'value']
     
-class GetProductSerializer(serializers.ModelSerializer):
+class RatingsMixin:
+    """get_ratings for product serializers; stats come from Product's denormalized ratings_* columns."""
+    include_ratings = True  # False returns only the stats, skipping per-rating serialization
+
+    def get_ratings(self,obj):
+        request = self.context.get('request')
+        #show how many stars ratings were rated acc to each star
+        stats = {'total_ratings': obj.ratings_total, 'rating_dict': obj.ratings_hist, 'avg_rating': obj.ratings_avg}
+        if not self.context.get('include_ratings', self.include_ratings):
+            return {"stats":stats}
+        # One RatingSerializer per list response (self is the shared child), so its fields are built once, not per product
+        rating_serializer = getattr(self, '_rating_serializer', None)
+        if rating_serializer is None:
+            rating_serializer = self._rating_serializer = RatingSerializer(context={'request': request})
+        return {"stats":stats, "data":[rating_serializer.to_representation(rating) for rating in obj.ratings.all()]}
+
+
+class GetProductSerializer(RatingsMixin, serializers.ModelSerializer):
     # comments = CommentSerializer(many=True, read_only=True)
     images = ProductImageSerializer(many = True, read_only = True)
     # brandName = serializers.SerializerMethodField()
@@ -91,29 +118,11 @@ class GetProductSerializer(serializers.ModelSerializer):
         # fields = '__all__'
         fields = ['product_id','name','category','price','old_price', 'before_deal_price','in_stock','images','ratings', 'auction', 'auction_start_time', 'base_price']
 
-    def get_ratings(self,obj):
-        request = self.context.get('request')
-        stats = {}
-        ratings = Rating.objects.filter(product=obj)
-        if ratings.exists():
-            total_ratings = ratings.count()
-            #show how many stars ratings were rated acc to each star
-            rating_dict = {1:0, 2:0, 3:0, 4:0, 5:0}
-            for rating in ratings:
-                rating_dict[rating.rating] += 1
-            avg_rating = sum(rating.rating for rating in ratings) / len(ratings)
-            avg_rating = round(avg_rating, 1)
-            stats = {'total_ratings': total_ratings, 'rating_dict': rating_dict, 'avg_rating': avg_rating}
-        else:
-            stats = {'total_ratings': 0, 'rating_dict': {1:0, 2:0, 3:0, 4:0, 5:0}, 'avg_rating':0}
-        serializer = RatingSerializer(ratings, many=True, context={'request': request})
-        return {"stats":stats, "data":serializer.data}
-    
     def get_brandName(self, obj):
         return obj.brand.name
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(RatingsMixin, serializers.ModelSerializer):
     comments = CommentSerializer(many=True, read_only=True)
     images = ProductImageSerializer(many = True, read_only = True)
     brandName = serializers.SerializerMethodField()
@@ -124,31 +133,19 @@ class ProductSerializer(serializers.ModelSerializer):
     attributes = ProductAttributeSerializer(many=True, read_only=True)
     class Meta:
         model = Product
-        fields = '__all__'
+        exclude = ['ratings_avg', 'ratings_total', 'ratings_hist', 'thumbnail', 'search_vector']  # stats are exposed through ratings.stats
 
-    def get_ratings(self,obj):
-        request = self.context.get('request')
-        stats = {}
-        ratings = Rating.objects.filter(product=obj)
-        if ratings.exists():
-            total_ratings = ratings.count()
-            #show how many stars ratings were rated acc to each star
-            rating_dict = {1:0, 2:0, 3:0, 4:0, 5:0}
-            for rating in ratings:
-                rating_dict[rating.rating] += 1
-            avg_rating = sum(rating.rating for rating in ratings) / len(ratings)
-            avg_rating = round(avg_rating, 1)
-            stats = {'total_ratings': total_ratings, 'rating_dict': rating_dict, 'avg_rating': avg_rating}
-        else:
-            stats = {'total_ratings': 0, 'rating_dict': {1:0, 2:0, 3:0, 4:0, 5:0}, 'avg_rating':0}
-        serializer = RatingSerializer(ratings, many=True, context={'request': request})
-        return {"stats":stats, "data":serializer.data}
-    
     def get_brandName(self, obj):
         return obj.brand.name
     def get_seriesName(self, obj):
         return obj.series.name if obj.series else None
 
+class ProductListSerializer(ProductSerializer):
+    """ProductSerializer for list pages: rating stats only, no individual ratings, no long text fields."""
+    include_ratings = False
+    class Meta(ProductSerializer.Meta):
+        exclude = ProductSerializer.Meta.exclude + ['description', 'meta_description', 'meta_keywords']
+
 class SeriesSerializer(serializers.ModelSerializer):
     class Meta:
         model = Series
@@ -1,35 +1,130 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from .models import Product
-import requests
-from django.http import JsonResponse
 from django.conf import settings
+from django.db import connections, transaction, DatabaseError
+from .models import update_thumbnails, Product, ProductImage, ProductAttribute, Rating, Brand, Series, Category, SubCategory
+from .cache import bump_catalogue_version
+from .tasks import post_product_to_fb
 import sys
+import logging
 
-# @receiver(post_save, sender=Product)
-# def post_to_fb(sender, instance, created, **kwargs):
-#     # --- FIX: skip this signal during loaddata / migrate ---
-#     if 'loaddata' in sys.argv or 'migrate' in sys.argv:
-#         return
-
-#     if created:
-#         print("HERE")
-#         message = f"The wait is now over for {instance.name}. The product is now available on our website. Click below to check it out now!"
-#         page_access_token = settings.FACEBOOK_PAGE_ACCESS_TOKEN
-#         print(page_access_token)
-#         page_id = settings.FACEBOOK_PAGE_ID
-#         print(page_id)
-
-#         url = f"https://graph.facebook.com/{page_id}/feed"
-#         payload = {
-#             'message': message,
-#             'link': f'https://www.dgtech.com.np/product/{instance.product_id}/',
-#             'access_token': page_access_token
-#         }
-
-#         try:
-#             res = requests.post(url, data=payload)
-#             print(res.json())
-#         except Exception as e:
-#             print("Facebook API error:", e)
+logger = logging.getLogger(__name__)
 
+# Posting runs in a Celery task after the transaction commits, so saving a product never waits on Facebook.
+# Off unless FACEBOOK_AUTO_POST is set.
+@receiver(post_save, sender=Product)
+def post_to_fb(sender, instance, created, **kwargs):
+    if not created or not settings.FACEBOOK_AUTO_POST:
+        return
+    # --- FIX: skip this signal during loaddata / migrate ---
+    if 'loaddata' in sys.argv or 'migrate' in sys.argv:
+        return
+    transaction.on_commit(lambda: post_product_to_fb.delay(instance.product_id, instance.name))
+
+
+# Any change to what the cached catalogue responses render invalidates them all, and the lookup tables with them.
+# Only save()/delete() send these signals: any bulk_create/bulk_update/queryset .update() writer of these models
+# must call bump_catalogue_version() itself once it has written.
+CATALOGUE_MODELS = (Product, ProductImage, ProductAttribute, Rating, Brand, Series, Category, SubCategory)
+
+@receiver([post_save, post_delete])
+def invalidate_catalogue_cache(sender, **kwargs):
+    if sender in CATALOGUE_MODELS:
+        bump_catalogue_version()
+
+
+# Trigram GIN indexes: (table, indexed expression). On PostgreSQL icontains (NavSearchView, the SearchFilter
+# fallback) compiles to UPPER(col::text) LIKE UPPER(%s), so those are on that expression; ApiSearch's
+# trigram_word_similar typo match compares the plain name.
+TRIGRAM_INDEXES = {
+    'shop_product_name_trgm': ('shop_product', 'UPPER(name::text)'),
+    'shop_product_description_trgm': ('shop_product', 'UPPER(description::text)'),
+    'shop_brand_name_trgm': ('shop_brand', 'UPPER(name::text)'),
+    'shop_category_name_trgm': ('shop_category', 'UPPER(name::text)'),
+    'shop_subcategory_name_trgm': ('shop_subcategory', 'UPPER(name::text)'),
+    'shop_series_name_trgm': ('shop_series', 'UPPER(name::text)'),
+    'shop_product_name_word_trgm': ('shop_product', 'name'),
+}
+
+# Product.search_vector: a BEFORE trigger recomputes it whenever a product's name or one of its four
+# foreign keys changes, and renaming a brand/category/sub-category/series re-touches its products.
+SEARCH_VECTOR_SQL = (
+    """
+    CREATE OR REPLACE FUNCTION shop_product_search_vector() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector(coalesce(NEW.name, '')), 'A') ||
+            setweight(to_tsvector(concat_ws(' ',
+                (SELECT name FROM shop_brand WHERE id = NEW.brand_id),
+                (SELECT name FROM shop_category WHERE id = NEW.category_id),
+                (SELECT name FROM shop_subcategory WHERE id = NEW.sub_category_id),
+                (SELECT name FROM shop_series WHERE id = NEW.series_id)
+            )), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS shop_product_search_vector ON shop_product",
+    """
+    CREATE TRIGGER shop_product_search_vector
+    BEFORE INSERT OR UPDATE OF name, brand_id, category_id, sub_category_id, series_id ON shop_product
+    FOR EACH ROW EXECUTE FUNCTION shop_product_search_vector()
+    """,
+    """
+    CREATE OR REPLACE FUNCTION shop_touch_products() RETURNS trigger AS $$
+    BEGIN
+        EXECUTE format('UPDATE shop_product SET name = name WHERE %I = $1', TG_ARGV[0]) USING NEW.id;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+) + tuple(
+    statement
+    for table, column in (
+        ('shop_brand', 'brand_id'), ('shop_category', 'category_id'),
+        ('shop_subcategory', 'sub_category_id'), ('shop_series', 'series_id'),
+    )
+    for statement in (
+        f"DROP TRIGGER IF EXISTS {table}_search_vector ON {table}",
+        f"CREATE TRIGGER {table}_search_vector AFTER UPDATE OF name ON {table} FOR EACH ROW "
+        f"WHEN (OLD.name IS DISTINCT FROM NEW.name) EXECUTE FUNCTION shop_touch_products('{column}')",
+    )
+) + (
+    # Backfill rows written before the trigger existed; a no-op once every product has a vector
+    "UPDATE shop_product SET name = name WHERE search_vector IS NULL",
+)
+
+def create_search_indexes(sender, using='default', **kwargs):
+    """post_migrate: enable pg_trgm, create TRIGRAM_INDEXES and the search_vector trigger and GIN index if
+    missing. Migrations aren't committed and development runs on SQLite, so these live here rather than in
+    Meta.indexes."""
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return
+    concurrently = '' if connection.in_atomic_block else 'CONCURRENTLY '
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+            for name, (table, expression) in TRIGRAM_INDEXES.items():
+                cursor.execute(
+                    f'CREATE INDEX {concurrently}IF NOT EXISTS {name} '
+                    f'ON {table} USING gin ({expression} gin_trgm_ops)'
+                )
+            for statement in SEARCH_VECTOR_SQL:
+                cursor.execute(statement)
+            cursor.execute(
+                f'CREATE INDEX {concurrently}IF NOT EXISTS shop_product_search_vector_gin '
+                f'ON shop_product USING gin (search_vector)'
+            )
+    except DatabaseError as e:
+        logger.warning("Could not create full-text search indexes: %s", e)
+
+
+def backfill_thumbnails(sender, using='default', **kwargs):
+    """post_migrate: fill the thumbnail of products that have images but were saved before the column existed,
+    or whose images arrived through a bulk write."""
+    with_images = ProductImage.objects.using(using).values('product_id')
+    filled = update_thumbnails(Product.objects.using(using).filter(thumbnail='', pk__in=with_images))
+    if filled:
+        bump_catalogue_version()
+        logger.info("Backfilled thumbnails for %d products", filled)
@@ -0,0 +1,35 @@
+from celery import shared_task
+from django.conf import settings
+import requests
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Reused across tasks in a worker so Graph API calls share one keep-alive connection
+session = requests.Session()
+
+@shared_task(autoretry_for=(requests.RequestException,), retry_backoff=5, max_retries=3)
+def post_product_to_fb(product_id, name):
+    """
+    Task for announcing a new product on the Facebook page asynchronously using Celery.
+    """
+    message = f"The wait is now over for {name}. The product is now available on our website. Click below to check it out now!"
+    page_access_token = settings.FACEBOOK_PAGE_ACCESS_TOKEN
+    page_id = settings.FACEBOOK_PAGE_ID
+
+    url = f"https://graph.facebook.com/{page_id}/feed"
+    payload = {
+        'message': message,
+        'link': f'https://www.dgtech.com.np/product/{product_id}/',
+        'access_token': page_access_token
+    }
+
+    try:
+        res = session.post(url, data=payload, timeout=5)
+    except requests.RequestException as e:
+        logger.warning("Facebook post for %s failed: %s", product_id, e)
+        raise  # retried by autoretry_for, with jittered exponential backoff from 5s
+    if res.ok:
+        logger.debug("Posted product %s to Facebook", product_id)
+    else:
+        logger.warning("Facebook post for %s returned %s: %s", product_id, res.status_code, res.text)
@@ -1,3 +1,215 @@
-from django.test import TestCase
+from datetime import timedelta
+from django.core.paginator import EmptyPage
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from userauth.models import User
+from .models import Product, Category, Brand, Rating
+from .views import EstimatedCountPaginator
 
-# Create your tests here.
+
+def make_product(name, **fields):
+    fields.setdefault('description', name)
+    return Product.objects.create(name=name, **fields)
+
+
+class RecommendationsViewTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.laptops = Category.objects.create(name='Laptop')
+        cls.mice = Category.objects.create(name='Mouse')
+        cls.brand = Brand.objects.create(name='Acme')
+        cls.product = make_product('Acme Book 14', price=1000, category=cls.laptops, brand=cls.brand)
+
+    def get(self, **params):
+        return self.client.get(reverse('recommendations'), params)
+
+    def test_upsells_are_available_products_in_the_price_band(self):
+        upsell = make_product('Acme Book 15', price=1200, category=self.laptops, brand=self.brand)
+        make_product('Acme Book 16', price=1300, category=self.laptops, brand=self.brand, is_available=False)
+        make_product('Acme Book Pro', price=5000, category=self.laptops, brand=self.brand)
+
+        response = self.get(product_id=self.product.product_id)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([p['product_id'] for p in response.data['upsells']], [upsell.product_id])
+
+    def test_equal_scores_are_ordered_newest_first_then_by_id(self):
+        today = timezone.now().date()
+        older = make_product('Acme Book 15 B', price=1200, category=self.laptops, brand=self.brand,
+                             published_date=today - timedelta(days=3))
+        newer_b = make_product('Acme Book 15 D', price=1300, category=self.laptops, brand=self.brand, published_date=today)
+        newer_a = make_product('Acme Book 15 C', price=1400, category=self.laptops, brand=self.brand, published_date=today)
+
+        response = self.get(product_id=self.product.product_id)
+
+        self.assertEqual([p['product_id'] for p in response.data['upsells']],
+                         [newer_a.product_id, newer_b.product_id, older.product_id])
+
+    def test_complementary_and_trending_skip_unavailable_products(self):
+        mouse = make_product('Acme Mouse', price=50, category=self.mice, brand=self.brand, trending=True)
+        make_product('Acme Mouse Old', price=40, category=self.mice, brand=self.brand, trending=True, is_available=False)
+
+        response = self.get(product_id=self.product.product_id)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([p['product_id'] for p in response.data['complementary']], [mouse.product_id])
+        self.assertEqual([p['product_id'] for p in response.data['trending']], [mouse.product_id])
+
+    def test_unknown_product_is_404(self):
+        response = self.get(product_id='no-such-product')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_missing_product_id_is_400(self):
+        self.assertEqual(self.get().status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class AuctionProductViewTests(APITestCase):
+    def test_page_number_envelope_ordered_by_start_time(self):
+        brand = Brand.objects.create(name='Acme')
+        now = timezone.now()
+        later = make_product('Acme Later', brand=brand, auction=True, auction_start_time=now + timedelta(days=2))
+        sooner = make_product('Acme Sooner', brand=brand, auction=True, auction_start_time=now + timedelta(days=1))
+        unscheduled = make_product('Acme Unscheduled', brand=brand, auction=True)
+        make_product('Acme Fixed Price', brand=brand)
+
+        response = self.client.get(reverse('auction'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual(response.data['total_pages'], 1)
+        self.assertEqual(response.data['current_page'], 1)
+        ids = [p['product_id'] for p in response.data['results']]
+        self.assertLess(ids.index(sooner.product_id), ids.index(later.product_id))
+        self.assertIn(unscheduled.product_id, ids)  # NULL start times sort first or last depending on the database
+
+
+class EstimatedCountPaginatorTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        brand = Brand.objects.create(name='Acme')
+        for n in range(5):
+            make_product(f'Acme Model {n}', brand=brand)
+
+    def paginator(self, estimate):
+        paginator = EstimatedCountPaginator(Product.objects.order_by('pk'), 2)
+        paginator.__dict__['count'] = estimate  # stands in for a reltuples estimate
+        return paginator
+
+    def test_low_estimate_does_not_hide_the_last_page(self):
+        page = self.paginator(estimate=1).page(3)
+        self.assertEqual(len(page.object_list), 1)
+        self.assertFalse(page.has_next())
+        self.assertEqual(page.paginator.count, 5)
+
+    def test_middle_page_knows_there_is_a_next_one(self):
+        page = self.paginator(estimate=1).page(2)
+        self.assertTrue(page.has_next())
+        self.assertGreaterEqual(page.paginator.count, 5)
+
+    def test_page_past_the_end_is_empty(self):
+        with self.assertRaises(EmptyPage):
+            self.paginator(estimate=100).page(4)
+
+
+API_SEARCH_URL = '/shop/api/search/'  # 'search' also names the nav search route
+
+
+class ListEnvelopeTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.brand = Brand.objects.create(name='Acme')
+        for n, price in enumerate([300, 100, 500, 200, 400]):
+            make_product(f'Acme Model {n}', price=price, brand=cls.brand)
+
+    def assertPageNumberEnvelope(self, data):
+        self.assertEqual(set(data), {'links', 'count', 'total_pages', 'current_page', 'results'})
+
+    def walk_cursor(self, url, params):
+        """Follow a cursor list's next links to the end, returning every page's results."""
+        response = self.client.get(url, params)
+        pages = []
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(set(response.data), {'links', 'results'})
+            pages.append(response.data['results'])
+            if not response.data['links']['next']:
+                return pages
+            response = self.client.get(response.data['links']['next'])
+
+    def test_api_search_keeps_one_envelope_with_and_without_a_term(self):
+        for params in ({}, {'search': 'Acme'}):
+            with self.subTest(params=params):
+                response = self.client.get(API_SEARCH_URL, params)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertPageNumberEnvelope(response.data)
+                self.assertEqual(response.data['count'], 5)
+
+    def test_api_search_honours_ordering(self):
+        response = self.client.get(API_SEARCH_URL, {'ordering': 'price', 'page_size': 2, 'page': 2})
+        self.assertPageNumberEnvelope(response.data)
+        self.assertEqual([p['price'] for p in response.data['results']], [300, 400])
+        self.assertEqual(response.data['total_pages'], 3)
+
+    def test_tagged_products_page_number_envelope(self):
+        response = self.client.get(reverse('tagged_products'), {'tag': 'latest', 'page_size': 2})
+        self.assertPageNumberEnvelope(response.data)
+        self.assertEqual(response.data['count'], 5)
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_brand_search_cursor_walks_in_requested_order(self):
+        pages = self.walk_cursor(reverse('brandsearch'), {'ordering': 'price', 'page_size': 2})
+        self.assertEqual([[p['price'] for p in page] for page in pages], [[100, 200], [300, 400], [500]])
+
+    def test_brand_search_cursor_default_order_is_newest_first(self):
+        pages = self.walk_cursor(reverse('brandsearch'), {'page_size': 2})
+        ids = [p['product_id'] for page in pages for p in page]
+        self.assertEqual(ids, list(Product.objects.order_by('-published_date', '-product_id').values_list('pk', flat=True)))
+
+
+class RatingViewTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='rater@example.com', name='Rater', password='secret')
+        cls.product = make_product('Acme Book 14', brand=Brand.objects.create(name='Acme'))
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def rate(self, product_id, rating):
+        return self.client.post(reverse('rating', args=[product_id]), {'rating': rating})
+
+    def test_first_rating_is_created_and_re_rating_updates_it(self):
+        self.assertEqual(self.rate(self.product.product_id, 4).status_code, status.HTTP_201_CREATED)
+
+        response = self.rate(self.product.product_id, 2)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['rating'], 2)
+        self.assertEqual(Rating.objects.filter(product=self.product, user=self.user).count(), 1)
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.ratings_total, self.product.ratings_avg), (1, 2))
+
+    def test_unknown_product_is_404(self):
+        self.assertEqual(self.rate('no-such-product', 4).status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ProductSlugTests(APITestCase):
+    def test_colliding_names_get_the_next_free_suffix(self):
+        ids = [make_product('Acme Book 14').product_id for _ in range(3)]
+        self.assertEqual(ids, ['acme-book-14', 'acme-book-14-1', 'acme-book-14-2'])
+
+    def test_suffix_follows_the_highest_taken(self):
+        make_product('Acme Book 14')
+        make_product('Acme Book 14', seo_friendly_name='acme-book-14-5')
+        self.assertEqual(make_product('Acme Book 14').product_id, 'acme-book-14-6')
+
+    def test_seo_friendly_name_is_preferred(self):
+        self.assertEqual(make_product('Acme Book 14', seo_friendly_name='Acme Book 14 Price').product_id, 'acme-book-14-price')
+
+    def test_saving_an_existing_product_keeps_its_id(self):
+        product = make_product('Acme Book 14')
+        product.name = 'Acme Book 14 (2025)'
+        product.save()
+        self.assertEqual(list(Product.objects.values_list('pk', flat=True)), ['acme-book-14'])
@@ -24,7 +24,7 @@ urlpatterns = [
     path('api/catsearch/<str:name>/<str:brandname>/<str:series>/', views.CatSearch.as_view(), name='catsearch'),
     path('api/subcatsearch/<str:name>/', views.SubcatSearch.as_view(), name='subcatsearch'),
     path('api/comments/<str:product_id>/', views.CommentView.as_view(), name='comment'),
-    path('api/replies/<int:comment_id>/', views.ReplyView.as_view(), name='comment'),
+    path('api/replies/<uuid:comment_id>/', views.ReplyView.as_view(), name='comment'),
     path('api/brandsearch',views.BrandSearch.as_view(),name='brandsearch'),
     path('api/catsearch/<str:catname>/<str:brandname>/<str:seriesname>',views.SeriesSearch.as_view(), name='seriessearch'),
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
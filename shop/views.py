@@ -1,32 +1,53 @@
-from django.shortcuts import render
+from django.shortcuts import render, get_object_or_404
+from django.http import JsonResponse
+from django.views import View
 import re
 from urllib.parse import unquote
 from typing import Optional
 from datetime import date
-from .models import Product,Comment, PageStats
+from collections import defaultdict
+from functools import lru_cache
+from .models import Product,Comment, PageStats, ProductImage, Repliess, Rating
 from math import ceil
-from .serializers import ProductSerializer, CommentSerializer, ReplySerializer, RatingSerializer, SeriesSerializer, GetProductSerializer
+from .serializers import ProductSerializer, ProductListSerializer, CommentSerializer, ReplySerializer, RatingSerializer, SeriesSerializer, GetProductSerializer
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework import filters
 from rest_framework import generics
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
 from rest_framework.authtoken.models import Token
 from django.contrib.auth import authenticate
-from rest_framework.pagination import PageNumberPagination
-from django.db.models import Avg, Count
+from rest_framework.pagination import PageNumberPagination, CursorPagination
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator as DjangoPaginator
+from django.utils.functional import cached_property
+from django.db import connections
+from django.db.models import F, IntegerField, Q, Prefetch
+from django.db.models.functions import Cast
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordDistance
 from django.conf import settings
+from django.utils.decorators import method_decorator
+from django.views.decorators.cache import cache_control
+from django.core.cache import cache
+from .cache import cache_catalogue_response, catalogue_version, lookup_ids, lookup_ids_matching, request_digest
 from rest_framework.permissions import IsAuthenticated
 from .serializers import EmiSerializer
-from shop.models import Brand, Series, Category
+from shop.models import Brand, Series, Category, SubCategory
 
 
+# Catalogue GETs are near-static; cache response data per URL, invalidated when catalogue models change
+cache_catalogue = method_decorator(cache_catalogue_response, name='get')
+
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+@lru_cache(maxsize=4096)  # slugs repeat across requests: the same few category/brand/series pages
 def decode_slug(value: Optional[str]) -> Optional[str]:
     if value is None:
         return None
     decoded = unquote(str(value))
     decoded = decoded.replace('-', ' ')
-    decoded = re.sub(r"\s+", " ", decoded).strip()
+    decoded = _WHITESPACE_RE.sub(" ", decoded).strip()
     return decoded or None
 
 # @api_view(['GET'])
@@ -36,11 +57,100 @@ def decode_slug(value: Optional[str]) -> Optional[str]:
 #     return Response(serializer.data)                  
 #function based view ma image ko right path janna only relative path like / media/shop/images bata janxa so class based use grya
 
+class EstimatedCountPaginator(DjangoPaginator):
+    """
+    Paginator that, for an unfiltered queryset over a large table on PostgreSQL, takes the count from the planner's
+    pg_class.reltuples estimate instead of running COUNT(*) on every page. Filtered querysets and tables under
+    exact_below rows are counted exactly. Only the reported count is approximate: pages are served by fetching
+    rows rather than by checking against the count, so an estimate never hides a real last page.
+    """
+    exact_below = 10000
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is not None and not query.where and not query.distinct and not query.combinator:
+            connection = connections[self.object_list.db]
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                        [self.object_list.model._meta.db_table],
+                    )
+                    row = cursor.fetchone()
+                if row and row[0] >= self.exact_below:
+                    return row[0]
+        return super().count
+
+    def validate_number(self, number):
+        # No upper bound: the count may be an estimate, so whether a page exists is decided by fetching it
+        try:
+            if isinstance(number, float) and not number.is_integer():
+                raise ValueError
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(self.error_messages['invalid_page'])
+        if number < 1:
+            raise EmptyPage(self.error_messages['min_page'])
+        return number
+
+    def page(self, number):
+        """
+        Fetches one row past the page so has_next does not depend on the estimate; the reported count is
+        corrected to what the fetch proves (exact on the last page, at least bottom + per_page + 1 otherwise).
+        """
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and (number > 1 or not self.allow_empty_first_page):
+            raise EmptyPage(self.error_messages['no_results'])
+        if len(rows) > self.per_page:
+            count = max(self.count, bottom + len(rows))
+        else:
+            count = bottom + len(rows)
+        self.__dict__['count'] = count
+        self.__dict__.pop('num_pages', None)
+        return self._get_page(rows[:self.per_page], number, self)
+
+
+class CachedCountPaginator(EstimatedCountPaginator):
+    """
+    Reuses the count stored under count_key (for CATALOGUE_CACHE_SECONDS) instead of counting again;
+    refresh=True, used for the first page, always recounts and stores the result.
+    """
+    def __init__(self, *args, count_key=None, refresh=False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.count_key = count_key
+        self.refresh = refresh
+
+    @cached_property
+    def count(self):
+        if self.count_key is None:
+            return super().count
+        if not self.refresh:
+            count = cache.get(self.count_key)
+            if count is not None:
+                return count
+        count = super().count
+        cache.set(self.count_key, count, settings.CATALOGUE_CACHE_SECONDS)
+        return count
+
+
 class CustomPagination(PageNumberPagination):
     page_size = 20
     page_size_query_param = 'page_size'
     max_page_size = 100
-    
+
+    def django_paginator_class(self, queryset, page_size):
+        # Called by paginate_queryset once self.request is set; the count is shared by every page of the same filtered listing
+        request = self.request
+        digest = request_digest(request, ignore=(self.page_query_param, self.page_size_query_param))
+        return CachedCountPaginator(
+            queryset, page_size,
+            count_key=f"catalogue:{catalogue_version()}:count:{digest}",
+            refresh=request.query_params.get(self.page_query_param, '1') == '1',
+        )
+
     def get_paginated_response(self, data):
         return Response({
             'links': {
@@ -54,205 +164,230 @@ class CustomPagination(PageNumberPagination):
         })
 
 
-class GetProduct(APIView):
+class ProductCursorPagination(CursorPagination):
+    """
+    Keyset pagination for scroll-style product lists: each page is an index range scan from the last row seen,
+    not an OFFSET that reads and discards every earlier row. No count/page numbers; same links/results envelope.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-published_date', '-product_id')
+
+    def get_paginated_response(self, data):
+        return Response({
+            'links': {
+                'next': self.get_next_link(),
+                'previous': self.get_previous_link()
+            },
+            'results': data
+        })
+
+
+class ProductSearchFilter(filters.SearchFilter):
+    """
+    On PostgreSQL: full-text match against the stored, GIN-indexed search_vector (product name weighted A, its
+    brand/category/sub-category/series names B), OR trigram word similarity on the name so typos still hit;
+    ranked unless ?ordering= is given. Other databases keep SearchFilter's icontains over search_fields.
+    """
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms or connections[queryset.db].vendor != 'postgresql':
+            return super().filter_queryset(request, queryset, view)
+        term = ' '.join(terms)
+        query = SearchQuery(term, search_type='websearch')
+        # alias(), not annotate(): the rank is only used in ORDER BY, never sent back per row
+        queryset = queryset.alias(search_rank=SearchRank(F('search_vector'), query)).filter(
+            Q(search_vector=query) | Q(name__trigram_word_similar=term)
+        )
+        if not queryset.query.order_by:
+            queryset = queryset.order_by('-search_rank', TrigramWordDistance(term, 'name'))
+        return queryset
+
+
+# ProductImageSerializer reads image.color; join it into the images query instead of a second prefetch
+IMAGES_WITH_COLOR = Prefetch('images', queryset=ProductImage.objects.select_related('color'))
+# CommentSerializer/ReplySerializer read user on every comment and reply; two joined queries for the whole tree
+COMMENTS_WITH_REPLIES = Prefetch('comments', queryset=Comment.objects.select_related('user').prefetch_related(
+    Prefetch('replies', queryset=Repliess.objects.select_related('user').order_by('published_date'))
+))
+
+# Only filtered and ranked on in SQL, never rendered
+DETAIL_DEFERRED_FIELDS = ('search_vector',)
+# Heavy text columns that list serializers never render
+LIST_DEFERRED_FIELDS = DETAIL_DEFERRED_FIELDS + ('description', 'meta_description', 'meta_keywords')
+# GetProductSerializer (search and auction cards) reads only these columns, plus ratings_* for the stats;
+# deferring every other concrete field is .only() expressed in PRODUCT_RELATIONS' defer slot
+GET_PRODUCT_COLUMNS = {
+    'product_id', 'name', 'category', 'price', 'old_price', 'before_deal_price', 'in_stock',
+    'auction', 'auction_start_time', 'base_price', 'ratings_avg', 'ratings_total', 'ratings_hist',
+}
+GET_PRODUCT_DEFERRED_FIELDS = tuple(
+    field.name for field in Product._meta.concrete_fields if field.name not in GET_PRODUCT_COLUMNS
+)
+
+# Relations each product serializer reads, and the columns it skips: (select_related, prefetch_related, defer).
+# Views name the serializer they render with and get the matching queryset; subclasses fall back to their parent's entry.
+PRODUCT_RELATIONS = {
+    ProductSerializer: (
+        ('brand', 'category', 'sub_category', 'series'),
+        (IMAGES_WITH_COLOR, 'attributes', COMMENTS_WITH_REPLIES, 'ratings__user'),
+        DETAIL_DEFERRED_FIELDS,
+    ),
+    ProductListSerializer: (
+        ('brand', 'category', 'sub_category', 'series'),
+        (IMAGES_WITH_COLOR, 'attributes', COMMENTS_WITH_REPLIES),
+        LIST_DEFERRED_FIELDS,
+    ),
+    GetProductSerializer: (
+        ('category',),
+        (IMAGES_WITH_COLOR, 'ratings__user'),
+        GET_PRODUCT_DEFERRED_FIELDS,
+    ),
+}
+
+def with_product_relations(queryset, serializer_class=ProductSerializer):
+    """Join/prefetch every relation serializer_class reads, so serializing a page costs a fixed number of queries."""
+    for cls in serializer_class.__mro__:
+        if cls in PRODUCT_RELATIONS:
+            select, prefetch, deferred = PRODUCT_RELATIONS[cls]
+            return queryset.select_related(*select).prefetch_related(*prefetch).defer(*deferred)
+    return queryset
+
+def product_list_queryset(queryset, serializer_class=ProductSerializer):
+    """Base queryset for the product list views: serializer relations loaded, plus the rating and
+    ratings_count names their min_rating filter and rating ordering use."""
+    # Aliases of Product's stored rating stats; no join or GROUP BY over ratings
+    return with_product_relations(queryset, serializer_class).alias(
+        rating=F('ratings_avg'),
+        ratings_count=F('ratings_total')
+    )
+
+
+# Numeric list filters: query parameter -> lookup. Non-numeric values are ignored, as before.
+PRODUCT_FILTER_PARAMS = (
+    ('min_rating', 'rating__gte'),
+    ('min_price', 'price__gte'),
+    ('max_price', 'price__lte'),
+)
+
+def apply_product_filters(queryset, params):
+    """The list views' min_rating/min_price/max_price and ?brand= (partial name) filters, as one filter() call."""
+    lookups = {}
+    for param, lookup in PRODUCT_FILTER_PARAMS:
+        try:
+            lookups[lookup] = float(params[param])
+        except (KeyError, ValueError, TypeError):
+            pass
+    if params.get('brand'):
+        lookups['brand__name__icontains'] = params['brand']
+    return queryset.filter(**lookups)
+
+# Orderings clients may request; each is backed by an index on Product, so no sort over unindexed columns
+ALLOWED_ORDERING = {'price', 'rating', 'published_date'}
+
+def requested_ordering(params):
+    """?ordering= values (several, or one space-separated value), keeping only ALLOWED_ORDERING fields."""
+    ordering_fields = params.getlist('ordering')
+    if len(ordering_fields) == 1 and " " in ordering_fields[0]:
+        ordering_fields = ordering_fields[0].split()
+    return [field for field in ordering_fields if field.lstrip('-') in ALLOWED_ORDERING]
+
+class ProductFilterMixin:
+    """
+    The list views' shared query-parameter handling: apply_product_filters, plus requested_ordering for
+    views that set order_by_request (the rest order through their OrderingFilter backend).
+    """
+    order_by_request = False
+
+    def filter_products(self, queryset):
+        params = self.request.query_params
+        queryset = apply_product_filters(queryset, params)
+        if self.order_by_request:
+            ordering_fields = requested_ordering(params)
+            if ordering_fields:
+                queryset = queryset.order_by(*ordering_fields)
+        return queryset
+
+
+@cache_catalogue
+class GetProduct(ProductFilterMixin, APIView):
+    order_by_request = True
+
     def get(self, request, format=None):
-        # Retrieve query parameters for filtering
-        min_rating = request.query_params.get('min_rating')
-        min_price = request.query_params.get('min_price')
-        max_price = request.query_params.get('max_price')
-        # Instead of a single 'ordering' value, expect multiple ordering parameters
-        ordering_fields = request.query_params.getlist('ordering')
-        brand = request.query_params.get('brand')
-        # Base queryset annotated with average rating and rating count
-        queryset = Product.objects.all().annotate(
-            rating=Avg('ratings__rating'),
-            ratings_count=Count('ratings')
-        ).order_by('-published_date')
-        
-        # Apply filtering based on min_rating, min_price, and max_price if provided
-        if min_rating:
-            try:
-                queryset = queryset.filter(rating__gte=float(min_rating))
-            except (ValueError, TypeError):
-                pass
-        if min_price:
-            try:
-                queryset = queryset.filter(price__gte=float(min_price))
-            except (ValueError, TypeError):
-                pass
-        if max_price:
-            try:
-                queryset = queryset.filter(price__lte=float(max_price))
-            except (ValueError, TypeError):
-                pass
-        if brand:
-            try:
-                queryset = queryset.filter(brand__name__icontains=brand)
-            except (ValueError, TypeError,):
-                pass
-        # Apply ordering based on multiple parameters
-        if ordering_fields:
-            # If there's only one ordering field and it contains spaces, split it into parts.
-            if len(ordering_fields) == 1 and " " in ordering_fields[0]:
-                ordering_fields = ordering_fields[0].split()
-            queryset = queryset.order_by(*ordering_fields)
+        # Base queryset with rating and ratings_count (stored stats) for filtering
+        queryset = self.filter_products(
+            product_list_queryset(Product.objects.all(), ProductListSerializer).order_by('-published_date')
+        )
         
         # Paginate the queryset using the custom pagination class
         paginator = CustomPagination()
         paginated_queryset = paginator.paginate_queryset(queryset, request, view=self)
-        serializer = ProductSerializer(paginated_queryset, many=True, context={'request': request})
+        serializer = ProductListSerializer(paginated_queryset, many=True, context={'request': request})
         
         # Return a paginated response
         return paginator.get_paginated_response(serializer.data)
 
 
 
-class GetDealProduct(APIView):
+@cache_catalogue
+class GetDealProduct(ProductFilterMixin, APIView):
+    order_by_request = True
 
     def get(self, request, format=None):
-        # Retrieve query parameters for filtering
-        min_rating = request.query_params.get('min_rating')
-        min_price = request.query_params.get('min_price')
-        max_price = request.query_params.get('max_price')
-        # Instead of a single 'ordering' value, expect multiple ordering parameters
-        ordering_fields = request.query_params.getlist('ordering')
-        brand = request.query_params.get('brand')
-        # Base queryset annotated with average rating and rating count
-        # Use select_related for ForeignKey relations and prefetch_related for reverse relations
-        queryset = Product.objects.filter(deal=True).select_related(
-            'brand', 'category', 'sub_category', 'series'
-        ).prefetch_related(
-            'ratings', 'colors'
-        ).annotate(
-            rating=Avg('ratings__rating'),
-            ratings_count=Count('ratings'),
+        # Base queryset with rating and ratings_count (stored stats) for filtering
+        queryset = self.filter_products(
+            product_list_queryset(Product.objects.filter(deal=True), ProductListSerializer)
         )
         
-        # Apply filtering based on min_rating, min_price, and max_price if provided
-        if min_rating:
-            try:
-                queryset = queryset.filter(rating__gte=float(min_rating))
-            except (ValueError, TypeError):
-                pass
-        if min_price:
-            try:
-                queryset = queryset.filter(price__gte=float(min_price))
-            except (ValueError, TypeError):
-                pass
-        if max_price:
-            try:
-                queryset = queryset.filter(price__lte=float(max_price))
-            except (ValueError, TypeError):
-                pass
-        if brand:
-            try:
-                queryset = queryset.filter(brand__name__icontains=brand)
-            except (ValueError, TypeError,):
-                pass
-        # Apply ordering based on multiple parameters
-        if ordering_fields:
-            # If there's only one ordering field and it contains spaces, split it into parts.
-            if len(ordering_fields) == 1 and " " in ordering_fields[0]:
-                ordering_fields = ordering_fields[0].split()
-            queryset = queryset.order_by(*ordering_fields)
-        
         # Paginate the queryset using the custom pagination class
         paginator = CustomPagination()
         paginated_queryset = paginator.paginate_queryset(queryset, request, view=self)
-        serializer = ProductSerializer(paginated_queryset, many=True, context={'request': request})
+        serializer = ProductListSerializer(paginated_queryset, many=True, context={'request': request})
         
         # Return a paginated response
         return paginator.get_paginated_response(serializer.data)
 
 
 
-class ApiSearch(generics.ListAPIView):
+# Search results vary too much for an ETag to pay off; let clients and proxies reuse an identical query briefly
+@method_decorator(cache_control(public=True, max_age=settings.CATALOGUE_CACHE_SECONDS), name='get')
+class ApiSearch(ProductFilterMixin, generics.ListAPIView):
     serializer_class = GetProductSerializer 
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
-    search_fields = ['product_id','name', 'description','brand__name','category__name','sub_category__name','series__name']
+    filter_backends = [ProductSearchFilter, filters.OrderingFilter]
+    search_fields = ['product_id','name', 'description','brand__name','category__name','sub_category__name','series__name']  # non-PostgreSQL fallback
     ordering_fields = ['price']  # Add more ordering fields if needed
     pagination_class = CustomPagination
+    order_by_request = True
 
     def get_queryset(self):
-        # Base queryset annotated with average rating and ratings count
-        # Use select_related for ForeignKey relations and prefetch_related for reverse relations
-        queryset = Product.objects.all().select_related(
-            'brand', 'category', 'sub_category', 'series'
-        ).prefetch_related(
-            'ratings', 'colors'
-        ).annotate(
-            rating=Avg('ratings__rating'),
-            ratings_count=Count('ratings')
-        )   
-        
-        request = self.request
-        # Retrieve query parameters for filtering
-        min_rating = request.query_params.get('min_rating')
-        min_price = request.query_params.get('min_price')
-        max_price = request.query_params.get('max_price')
-        brand = request.query_params.get('brand')
-        ordering_fields = request.query_params.getlist('ordering')
-        
-        # Filter by minimum rating
-        if min_rating:
-            try:
-                queryset = queryset.filter(rating__gte=float(min_rating))
-            except (ValueError, TypeError):
-                pass
-
-        # Filter by minimum and maximum price
-        if min_price:
-            try:
-                queryset = queryset.filter(price__gte=float(min_price))
-            except (ValueError, TypeError):
-                pass
-        if max_price:
-            try:
-                queryset = queryset.filter(price__lte=float(max_price))
-            except (ValueError, TypeError):
-                pass
-
-        # Filter by brand (case-insensitive partial match)
-        if brand:
-            try:
-                queryset = queryset.filter(brand__name__icontains=brand)
-            except (ValueError, TypeError):
-                pass
-
-        # Apply ordering if provided. If a single ordering parameter contains spaces,
-        # split it into multiple fields.
-        if ordering_fields:
-            if len(ordering_fields) == 1 and " " in ordering_fields[0]:
-                ordering_fields = ordering_fields[0].split()
-            queryset = queryset.order_by(*ordering_fields)
-        
-        return queryset
+        # Base queryset with rating and ratings_count (stored stats) for filtering
+        return self.filter_products(product_list_queryset(Product.objects.all(), GetProductSerializer))
 
 
 class BrandSearch(generics.ListAPIView):
-    queryset = Product.objects.all()
-    serializer_class = ProductSerializer
+    queryset = with_product_relations(Product.objects.all(), ProductListSerializer)
+    serializer_class = ProductListSerializer
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['brandName']
     ordering_fields = ['price']
+    pagination_class = ProductCursorPagination
 
 class ProductSearch(APIView):
     
     def get(self,request,id):
-        try:
-            product = Product.objects.get(pk=id)
-        except Product.DoesNotExist:
-            return Response(status=status.HTTP_404_NOT_FOUND)
+        product = get_object_or_404(with_product_relations(Product.objects.all()), pk=id)
         serializer = ProductSerializer(product,context={"request": request})
         return Response(serializer.data)
 
 
         
 
-class CatSearch(generics.ListAPIView):
-    serializer_class = ProductSerializer
+@cache_catalogue
+class CatSearch(ProductFilterMixin, generics.ListAPIView):
+    serializer_class = ProductListSerializer
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
-    ordering_fields = ['price', 'min_rating','rating','min_price','max_price']
+    ordering_fields = ['price', 'rating']
     pagination_class = CustomPagination
 
     def get_queryset(self):
@@ -260,139 +395,50 @@ class CatSearch(generics.ListAPIView):
         brand = decode_slug(self.kwargs.get('brandname'))
         series = decode_slug(self.kwargs.get('series')) or decode_slug(self.kwargs.get('seriesname'))
 
-        min_rating = self.request.query_params.get('min_rating')
-        min_price = self.request.query_params.get('min_price')
-        max_price = self.request.query_params.get('max_price')
-        
-        queryset = Product.objects.filter(category__name__iexact=cat).select_related(
-            'brand', 'category', 'sub_category', 'series'
-        ).prefetch_related(
-            'ratings', 'colors'
-        )
+        # Names resolve to ids from the in-process lookup tables, so the filters are plain FK index lookups
+        queryset = product_list_queryset(Product.objects.filter(category_id__in=lookup_ids(Category, cat)), self.serializer_class)
         if brand:
-            queryset = queryset.filter(brand__name__iexact=brand)
+            queryset = queryset.filter(brand_id__in=lookup_ids(Brand, brand))
         if series:
-            queryset = queryset.filter(series__name__iexact=series)
-        queryset = queryset.annotate(
-            rating=Avg('ratings__rating'),
-            ratings_count=Count('ratings')
-        )
+            queryset = queryset.filter(series_id__in=lookup_ids(Series, series))
 
-        if min_rating:
-            try:
-                min_rating = float(min_rating)
-                queryset = queryset.filter(rating__gte=min_rating)
-            except (ValueError, TypeError):
-                pass
-        
-        if min_price:
-            try:
-                min_price = float(min_price)
-                queryset = queryset.filter(price__gte=min_price)
-            except (ValueError, TypeError):
-                pass
-        if max_price:
-            try:
-                max_price = float(max_price)
-                queryset = queryset.filter(price__lte=max_price)
-            except (ValueError, TypeError):
-                pass
-
-        return queryset
+        return self.filter_products(queryset)
 
     
-class SubcatSearch(generics.ListAPIView):
-    serializer_class = ProductSerializer
+class SubcatSearch(ProductFilterMixin, generics.ListAPIView):
+    serializer_class = ProductListSerializer
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
-    ordering_fields = ['price', 'min_rating','rating','min_price','max_price']
+    ordering_fields = ['price', 'rating']
     pagination_class = CustomPagination
     
     def get_queryset(self):
-        sub_cat = self.kwargs.get('name')
-        min_rating = self.request.query_params.get('min_rating')
-        min_price = self.request.query_params.get('min_price')
-        max_price = self.request.query_params.get('max_price')
-        
-        queryset = Product.objects.filter(sub_category__iexact=sub_cat)
-
-        queryset = queryset.annotate(
-            rating=Avg('ratings__rating'),
-            ratings_count=Count('ratings')
-        )
-        
-        # Filter by minimum rating if provided
-        if min_rating:
-            try:
-                min_rating = float(min_rating)
-                queryset = queryset.filter(rating__gte=min_rating)
-            except (ValueError, TypeError):
-                pass
-        
-        if min_price:
-            try:
-                min_price = float(min_price)
-                queryset = queryset.filter(price__gte=min_price)
-            except (ValueError, TypeError):
-                pass
-        if max_price:
-            try:
-                max_price = float(max_price)
-                queryset = queryset.filter(price__lte=max_price)
-            except (ValueError, TypeError):
-                pass
-
-        return queryset
+        sub_cat = decode_slug(self.kwargs.get('name'))
+        queryset = product_list_queryset(Product.objects.filter(sub_category_id__in=lookup_ids(SubCategory, sub_cat)), self.serializer_class)
+        return self.filter_products(queryset)
     
-class CatBrandSearch(generics.ListAPIView):
-    serializer_class = ProductSerializer
+@cache_catalogue
+class CatBrandSearch(ProductFilterMixin, generics.ListAPIView):
+    serializer_class = ProductListSerializer
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
-    ordering_fields = ['price', 'min_rating','rating','min_price','max_price']
+    ordering_fields = ['price', 'rating']
     pagination_class = CustomPagination
 
     def get_queryset(self):
         cat = decode_slug(self.kwargs.get('catname'))
         brand = decode_slug(self.kwargs.get('brandname'))
 
-        
-        min_rating = self.request.query_params.get('min_rating')
-        min_price = self.request.query_params.get('min_price')
-        max_price = self.request.query_params.get('max_price')
-
+        queryset = Product.objects.filter(category_id__in=lookup_ids(Category, cat))
         if brand:
-            queryset = Product.objects.filter(category__name__iexact=cat, brand__name__iexact=brand)
-        else:
-            queryset = Product.objects.filter(category__name__iexact=cat)
-        queryset = queryset.annotate(
-            rating=Avg('ratings__rating'),
-            ratings_count=Count('ratings')
-        )
-
-        if min_rating:
-            try:
-                min_rating = float(min_rating)
-                queryset = queryset.filter(rating__gte=min_rating)
-            except (ValueError, TypeError):
-                pass
-        
-        if min_price:
-            try:
-                min_price = float(min_price)
-                queryset = queryset.filter(price__gte=min_price)
-            except (ValueError, TypeError):
-                pass
-        if max_price:
-            try:
-                max_price = float(max_price)
-                queryset = queryset.filter(price__lte=max_price)
-            except (ValueError, TypeError):
-                pass
+            queryset = queryset.filter(brand_id__in=lookup_ids(Brand, brand))
+        queryset = product_list_queryset(queryset, self.serializer_class)
 
-        return queryset
+        return self.filter_products(queryset)
     
 class SeriesSearch(generics.ListAPIView):
-    serializer_class = ProductSerializer
+    serializer_class = ProductListSerializer
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     ordering_fields = ['price']
+    pagination_class = ProductCursorPagination
 
     def get_queryset(self):
         cat = decode_slug(self.kwargs.get('catname'))
@@ -402,16 +448,16 @@ class SeriesSearch(generics.ListAPIView):
         if not (cat and brand and series):
             return Product.objects.none()
 
-        return Product.objects.filter(
-            category__name__iexact=cat,
-            brand__name__iexact=brand,
-            series__name__iexact=series,
-        )
+        return with_product_relations(Product.objects.filter(
+            category_id__in=lookup_ids(Category, cat),
+            brand_id__in=lookup_ids(Brand, brand),
+            series_id__in=lookup_ids(Series, series),
+        ), self.serializer_class)
 
 class CommentView(APIView):
     def post(self, request, product_id):
         data = request.data
-        product = Product.objects.get(pk=product_id)
+        product = get_object_or_404(Product.objects.only('pk'), pk=product_id)  # only needed as the FK
         user = request.user  # Get the user making the request
         serializer = CommentSerializer(data=data, context={'request': request})
         if serializer.is_valid():
@@ -424,7 +470,7 @@ class CommentView(APIView):
 class ReplyView(APIView):
     def post(self, request, comment_id):
         data = request.data
-        comment = Comment.objects.get(pk=comment_id)
+        comment = get_object_or_404(Comment.objects.only('pk'), pk=comment_id)
         user = request.user  # Get the user making the request
         serializer = ReplySerializer(data=data, context={'request': request})
         if serializer.is_valid():
@@ -438,41 +484,49 @@ class RatingView(APIView):
     def post(self,request,product_id):
         data = request.data
         user = request.user
-        product = Product.objects.get(pk=product_id)
-        serializer = RatingSerializer(data=data)
-        if serializer.is_valid(raise_exception=True):
-            serializer.save(user=user, product=product)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+        product = get_object_or_404(Product.objects.only('pk'), pk=product_id)
+        # One rating per user and product: re-rating updates the existing row instead of hitting unique_together
+        rating = Rating.objects.filter(product=product, user=user).first()
+        serializer = RatingSerializer(rating, data=data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        serializer.save(user=user, product=product)
+        return Response(serializer.data, status=status.HTTP_201_CREATED if rating is None else status.HTTP_200_OK)
         
             
 
-class NavSearchView(APIView):   
+class NavSearchView(View):
+    """Search-as-you-type: a plain Django view returning values() rows, skipping DRF and model instances."""
     def get(self,request):
-        search = request.query_params.get('search')
-        #now get 10 products that match the search
-        products = Product.objects.filter(name__icontains=search)[:10]
-        list = []
-        for p in products:
-            list.append({"name":p.name,"id":p.product_id,"image":p.images.first().image.url, "price":p.price})
-        return Response(list)
-
+        search = request.GET.get('search')
+        if not search:
+            return JsonResponse([], safe=False)
+        #now get 10 products that match the search; thumbnail is the stored name of each product's first image
+        rows = Product.objects.filter(name__icontains=search).values_list('name', 'product_id', 'thumbnail', 'price')[:10]
+        storage = ProductImage._meta.get_field('image').storage
+        return JsonResponse([
+            {"name":name,"id":product_id,"image":storage.url(thumbnail) if thumbnail else None, "price":price}
+            for name, product_id, thumbnail, price in rows
+        ], safe=False)
+
+@cache_catalogue
 class NavCatView(APIView):
     def get(self,request):
         # search = request.query_params.get('search')
         #now get brands and series that match the search
         #filter the products that match the search and then get brands and series that match the search
         # products = Product.objects.filter(category__name__iexact=search)
-        categories = Category.objects.all()
-        list1 = []
-        for category in categories:
-            list = []
-            brands = Brand.objects.filter(category=category)
-            for b in brands:
-                series = b.series.filter(category=category)
-                series = SeriesSerializer(series,many=True).data
-                list.append({"brand":b.name,"series":series})
-            list1.append({category.name:list})
-            
+        # Three values() queries, no model instances: every series grouped by (brand, category),
+        # every brand-category link with the brand name, and the categories
+        series_by_pair = defaultdict(list)
+        for brand_id, category_id, series_id, name in Series.objects.values_list('brand_id', 'category_id', 'id', 'name').iterator(chunk_size=2000):
+            series_by_pair[brand_id, category_id].append({"id": series_id, "name": name})
+        brands_by_category = defaultdict(list)
+        for category_id, brand_id, brand_name in Brand.category.through.objects.values_list('category_id', 'brand_id', 'brand__name').iterator(chunk_size=2000):
+            brands_by_category[category_id].append({"brand": brand_name, "series": series_by_pair[brand_id, category_id]})
+        list1 = [
+            {name: brands_by_category[category_id]}
+            for category_id, name in Category.objects.values_list('id', 'name')
+        ]
         return Response(list1)
 
 
@@ -488,18 +542,33 @@ class EmiView(APIView):
 
 
 
-class TaggedProductsView(APIView):
-    def get(self,request):
-        tag = request.query_params.get('tag')
-        if tag == 'trending':
-            products = Product.objects.filter(trending=True)
-        elif tag == 'best_seller':
-            products = Product.objects.filter(best_seller=True)
-        elif tag == 'latest':
-            products = Product.objects.all().order_by('-published_date')[:12]
-        serializer = ProductSerializer(products,many=True,context={'request': request})
-        return Response(serializer.data)
+# ?tag= -> filter; every tag lists newest first, each backed by a (partial) published_date index
+PRODUCT_TAGS = {
+    'trending': Q(trending=True),
+    'best_seller': Q(best_seller=True),
+    'latest': Q(),
+}
+
+@cache_catalogue
+class TaggedProductsView(generics.ListAPIView):
+    serializer_class = ProductListSerializer
+    pagination_class = CustomPagination
+
+    def get_queryset(self):
+        tag = self.request.query_params.get('tag')
+        if tag not in PRODUCT_TAGS:
+            raise ValidationError({'tag': f"Must be one of: {', '.join(PRODUCT_TAGS)}."})
+        return with_product_relations(
+            Product.objects.filter(PRODUCT_TAGS[tag]), self.serializer_class
+        ).order_by('-published_date', '-product_id')
+
 
+# Recommendation priority: trending=3, featured=2, deal=1 (Product has no hot flag)
+RECOMMENDATION_SCORE = (
+    Cast('trending', IntegerField()) * 3 + Cast('featured', IntegerField()) * 2 + Cast('deal', IntegerField())
+)
+# Ties broken newest first, then by id, so the top-15 cut is the same on every query
+RECOMMENDATION_ORDER = ('-score', '-published_date', 'product_id')
 
 class RecommendationsView(APIView):
     # Complementary category mappings for cross-sells
@@ -512,6 +581,12 @@ class RecommendationsView(APIView):
         'tablet': ['stylus', 'tablet case', 'screen protector', 'keyboard'],
     }
     
+    # One compiled, case-insensitive alternation per trigger, matched against the cached category names
+    COMPLEMENTARY_PATTERNS = {
+        key: re.compile('|'.join(map(re.escape, values)), re.IGNORECASE)
+        for key, values in COMPLEMENTARY_CATEGORIES.items()
+    }
+
     def get(self, request):
         product_id = request.query_params.get('product_id')
         
@@ -519,7 +594,10 @@ class RecommendationsView(APIView):
             return Response({'error': 'product_id is required'}, status=status.HTTP_400_BAD_REQUEST)
         
         try:
-            current_product = Product.objects.get(product_id=product_id)
+            # Only the price and category (joined) are read below
+            current_product = Product.objects.select_related('category').only(
+                'product_id', 'price', 'category__id', 'category__name'
+            ).get(product_id=product_id)
         except Product.DoesNotExist:
             return Response({'error': 'Product not found'}, status=status.HTTP_404_NOT_FOUND)
         
@@ -537,77 +615,46 @@ class RecommendationsView(APIView):
             min_price = current_product.price * 1.1  # 10% higher
             max_price = current_product.price * 1.5  # 50% higher
             
-            upsell_candidates = Product.objects.filter(
+            upsell_candidates = with_product_relations(Product.objects.all(), ProductListSerializer).filter(
                 category=current_product.category,
                 price__gte=min_price,
                 price__lte=max_price,
-                stock__gt=0
+                is_available=True
             ).exclude(
                 product_id=product_id
             )
             
-            # Calculate priority score: hot=4, trending=3, featured=2, new=1
-            upsells = []
-            for product in upsell_candidates:
-                score = 0
-                if hasattr(product, 'hot') and product.hot:
-                    score += 4
-                if product.trending:
-                    score += 3
-                if product.featured:
-                    score += 2
-                if product.deal:
-                    score += 1
-                upsells.append((product, score))
-            
-            # Sort by priority score and take top 15
-            upsells.sort(key=lambda x: x[1], reverse=True)
-            recommendations['upsells'] = ProductSerializer(
-                [p[0] for p in upsells[:15]], 
+            # Top 15 by priority score, ranked and sliced in the database
+            upsells = upsell_candidates.alias(score=RECOMMENDATION_SCORE).order_by(*RECOMMENDATION_ORDER)[:15]
+            recommendations['upsells'] = ProductListSerializer(
+                upsells, 
                 many=True, 
                 context={'request': request}
             ).data
         
         # 2. COMPLEMENTARY PRODUCTS: Cross-category recommendations
-        complementary_cats = []
-        for key, values in self.COMPLEMENTARY_CATEGORIES.items():
+        complementary_pattern = None
+        for key, pattern in self.COMPLEMENTARY_PATTERNS.items():
             if key in category_name:
-                complementary_cats = values
+                complementary_pattern = pattern
                 break
         
-        if complementary_cats:
-            # Get categories that match complementary names
-            matching_categories = Category.objects.filter(
-                name__iregex=r'(' + '|'.join(complementary_cats) + ')'
-            )
+        if complementary_pattern:
+            # Ids of categories whose names match, from the in-process table: no regex scan in the database
+            matching_categories = lookup_ids_matching(Category, complementary_pattern)
             
-            if matching_categories.exists():
-                complementary_products = Product.objects.filter(
-                    category__in=matching_categories,
-                    stock__gt=0
+            if matching_categories:
+                complementary_products = with_product_relations(Product.objects.all(), ProductListSerializer).filter(
+                    category_id__in=matching_categories,
+                    is_available=True
                 ).exclude(
                     product_id=product_id
                 )
                 
-                # Calculate priority scores
-                comps = []
-                for product in complementary_products:
-                    score = 0
-                    if hasattr(product, 'hot') and product.hot:
-                        score += 4
-                    if product.trending:
-                        score += 3
-                    if product.featured:
-                        score += 2
-                    if product.deal:
-                        score += 1
-                    comps.append((product, score))
-                
-                # Sort by priority and take top 15
-                comps.sort(key=lambda x: x[1], reverse=True)
-                print(comps)
-                recommendations['complementary'] = ProductSerializer(
-                    [p[0] for p in comps[:15]], 
+                # Top 15 by priority score
+                comps = complementary_products.alias(score=RECOMMENDATION_SCORE).order_by(*RECOMMENDATION_ORDER)[:15]
+                recommendations['complementary'] = ProductListSerializer(
+                    comps, 
                     many=True, 
                     context={'request': request}
                 ).data
@@ -616,15 +663,15 @@ class RecommendationsView(APIView):
         total_recs = len(recommendations['upsells']) + len(recommendations['complementary'])
         if total_recs < 10:
             needed = 15 - total_recs
-            trending_products = Product.objects.filter(
-                stock__gt=0
+            trending_products = with_product_relations(Product.objects.all(), ProductListSerializer).filter(
+                is_available=True
             ).filter(
                 trending=True
             ).exclude(
                 product_id=product_id
             ).order_by('-published_date')[:needed]
             
-            recommendations['trending'] = ProductSerializer(
+            recommendations['trending'] = ProductListSerializer(
                 trending_products, 
                 many=True, 
                 context={'request': request}
@@ -636,24 +683,16 @@ class VisitView(APIView):
         stats, created = PageStats.objects.get_or_create(pk=1)
         # Reset visits if it's a new day
         if stats.last_reset != date.today():
-            stats.visits = 0
-            stats.last_reset = date.today()
-            stats.save()
+            PageStats.objects.filter(pk=1, last_reset=stats.last_reset).update(visits=0, last_reset=date.today())
+            return Response({'visits': 0})
         return Response({'visits': stats.visits})
 
     def post(self, request):
-        stats, created = PageStats.objects.get_or_create(pk=1)
-        # Reset visits if it's a new day
-        if stats.last_reset != date.today():
-            stats.visits = 0
-            stats.last_reset = date.today()
-        stats.visits += 1
-        stats.save()
-        return Response({'visits': stats.visits})
+        return Response({'visits': PageStats.bump()})
 
 class AuctionProductView(generics.ListAPIView):
     serializer_class = GetProductSerializer
     pagination_class = CustomPagination
     
     def get_queryset(self):        
-        return Product.objects.filter(auction=True).order_by('auction_start_time')
+        return with_product_relations(Product.objects.filter(auction=True), GetProductSerializer).order_by('auction_start_time', 'product_id')
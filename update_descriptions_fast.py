@@ -1,14 +1,17 @@
 #!/usr/bin/env python
 """
 Fast batch update product descriptions using Gemini API.
-Batch 5 products per request for speed while maintaining quality.
+Batch 5 products per request for speed while maintaining quality, with
+several requests in flight at once (--concurrency).
 
 Uses Google Gemini instead of Ollama for 10x faster processing.
 """
 
 import os
+import asyncio
 import django
 import json
+import logging
 import time
 import argparse
 import sys
@@ -20,8 +23,11 @@ from typing import List, Dict, Optional
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ecommerce.settings')
 django.setup()
 
+from asgiref.sync import sync_to_async
 from shop.models import Product
+from shop.cache import bump_catalogue_version
 import google.generativeai as genai
+from google.api_core.exceptions import ResourceExhausted
 from dotenv import load_dotenv
 
 # ============================================================================
@@ -33,19 +39,29 @@ load_dotenv(ENV_PATH)
 
 API_KEY = os.getenv('GOOGLE_API_KEY')
 BATCH_SIZE = 5  # Products per API call (good balance of speed + quality)
-DELAY_BETWEEN_CALLS = 0.5  # Seconds between API calls
-PROGRESS_FILE = 'description_update_ollama_progress.json'
+REQUESTS_PER_MINUTE = 15  # API requests started per minute, across all slots (Gemini free tier: 20)
+CONCURRENCY = 2  # API requests in flight at once
+MAX_RETRIES = 3  # Retries per batch, with exponential backoff
+QUOTA_BACKOFF = 30  # Seconds to wait after a 429, times the attempt number
+PROGRESS_FILE = 'description_update_progress.ndjson'  # Append-only, one JSON line per finished product
+LEGACY_PROGRESS_FILE = 'description_update_ollama_progress.json'  # Old whole-file format, imported once
+FSYNC_EVERY = 10  # Batches between fsyncs of the progress log (every batch is still flushed)
 LOG_FILE = 'description_gemini.log'
 
 # ============================================================================
 # LOGGING
 # ============================================================================
 
+# One FileHandler for the whole run: the log file is opened once (on first write), not per message
+logger = logging.getLogger('update_descriptions_fast')
+logger.setLevel(logging.INFO)
+logger.propagate = False
+_file_handler = logging.FileHandler(LOG_FILE, delay=True)
+_file_handler.setFormatter(logging.Formatter('[%(asctime)s] [%(status)s] %(message)s', datefmt='%Y-%m-%d %H:%M:%S'))
+logger.addHandler(_file_handler)
+
 def log_message(msg: str, level: str = "INFO"):
     """Log messages to both console and file."""
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    log_entry = f"[{timestamp}] [{level}] {msg}"
-    
     if level == "ERROR":
         print(f"❌ {msg}")
     elif level == "SUCCESS":
@@ -55,39 +71,104 @@ def log_message(msg: str, level: str = "INFO"):
     else:
         print(f"ℹ️ {msg}")
     
-    try:
-        with open(LOG_FILE, 'a') as f:
-            f.write(log_entry + '\n')
-    except:
-        pass
+    # SUCCESS is logged at INFO; the file line keeps the original level name
+    logger.log(getattr(logging, level, logging.INFO), msg, extra={'status': level})
 
 # ============================================================================
 # PROGRESS TRACKING
 # ============================================================================
 
-def load_progress() -> Dict:
-    """Load progress from file to enable resuming."""
-    if os.path.exists(PROGRESS_FILE):
+class ProgressLog:
+    """
+    Resumable progress as newline-delimited JSON: {"id": ..., "status": "processed"|"failed", "ts": ...}.
+    Each batch appends its own lines instead of rewriting every id seen so far;
+    a torn last line from a crash is skipped on load.
+    """
+    
+    def __init__(self, path: str = PROGRESS_FILE, fsync_every: int = FSYNC_EVERY):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.processed = set()
+        self.failed = set()
+        self._file = None
+        self._batches = 0
+        self._load()
+    
+    def _load(self):
+        if os.path.exists(self.path):
+            with open(self.path, 'r') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    (self.processed if entry.get('status') == 'processed' else self.failed).add(entry['id'])
+        elif os.path.exists(LEGACY_PROGRESS_FILE):
+            try:
+                with open(LEGACY_PROGRESS_FILE, 'r') as f:
+                    legacy = json.load(f)
+                self.processed.update(legacy.get('processed', []))
+                self.failed.update(legacy.get('failed', []))
+                self.compact()
+                log_message(f"Imported {len(self.processed)} processed ids from {LEGACY_PROGRESS_FILE}", "INFO")
+            except Exception as e:
+                log_message(f"Could not import {LEGACY_PROGRESS_FILE}: {e}", "WARNING")
+    
+    def compact(self):
+        """Rewrite the log as one line per id, atomically (temp file + os.replace)."""
+        ts = datetime.now().isoformat()
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            for status, ids in (('processed', self.processed), ('failed', self.failed)):
+                for pid in ids:
+                    f.write(json.dumps({'id': pid, 'status': status, 'ts': ts}) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+    
+    def record(self, processed: List[str] = (), failed: List[str] = ()):
+        """Append one batch's results; flushed now, fsynced every fsync_every batches."""
+        self.processed.update(processed)
+        self.failed.update(failed)
         try:
-            with open(PROGRESS_FILE, 'r') as f:
-                return json.load(f)
-        except:
-            pass
-    return {
-        'processed': [],
-        'failed': [],
-        'total': 0,
-        'started_at': None,
-        'last_batch': 0
-    }
+            if self._file is None:
+                self._file = open(self.path, 'a')
+            ts = datetime.now().isoformat()
+            for status, ids in (('processed', processed), ('failed', failed)):
+                for pid in ids:
+                    self._file.write(json.dumps({'id': pid, 'status': status, 'ts': ts}) + '\n')
+            self._file.flush()
+            self._batches += 1
+            if self._batches % self.fsync_every == 0:
+                os.fsync(self._file.fileno())
+        except Exception as e:
+            log_message(f"Failed to save progress: {e}", "WARNING")
+    
+    def close(self):
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
 
-def save_progress(progress: Dict):
-    """Save progress to file."""
-    try:
-        with open(PROGRESS_FILE, 'w') as f:
-            json.dump(progress, f, indent=2)
-    except Exception as e:
-        log_message(f"Failed to save progress: {e}", "WARNING")
+# ============================================================================
+# RATE LIMITING
+# ============================================================================
+
+class RequestSpacer:
+    """Starts API requests at least 60/rpm seconds apart, however many are in flight."""
+    
+    def __init__(self, rpm: float = REQUESTS_PER_MINUTE):
+        self.interval = 60 / rpm
+        self._next = 0.0
+    
+    async def wait(self):
+        # The slot is reserved before sleeping, so concurrent callers queue up behind each other
+        now = time.monotonic()
+        start = max(now, self._next)
+        self._next = start + self.interval
+        if start > now:
+            await asyncio.sleep(start - now)
 
 # ============================================================================
 # GEMINI DESCRIPTION GENERATION
@@ -96,7 +177,7 @@ def save_progress(progress: Dict):
 class GeminiDescriptionGenerator:
     """Generates product descriptions using Gemini API (batch mode)."""
     
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, rpm: float = REQUESTS_PER_MINUTE):
         if not api_key:
             log_message("GOOGLE_API_KEY not found in .env file", "ERROR")
             log_message("Create a .env file with: GOOGLE_API_KEY='your-key-here'", "ERROR")
@@ -105,6 +186,7 @@ class GeminiDescriptionGenerator:
         self.api_key = api_key
         self.model = None
         self.call_count = 0
+        self.spacer = RequestSpacer(rpm)
         self.setup_genai()
     
     def setup_genai(self):
@@ -117,7 +199,7 @@ class GeminiDescriptionGenerator:
             log_message(f"Failed to connect to Gemini API: {e}", "ERROR")
             sys.exit(1)
     
-    def generate_batch_descriptions(self, products_data: List[Dict]) -> List[Optional[str]]:
+    async def generate_batch_descriptions(self, products_data: List[Dict]) -> List[Optional[str]]:
         """Generate descriptions for multiple products in one request."""
         
         product_list = "\n".join([
@@ -150,17 +232,22 @@ Output EXACTLY as:
 
 Start with "1." - nothing before it. Number each item sequentially."""
 
-        try:
-            response = self.model.generate_content(prompt)
-            self.call_count += 1
+        for attempt in range(MAX_RETRIES + 1):
+            await self.spacer.wait()
+            try:
+                response = await self.model.generate_content_async(prompt)
+                self.call_count += 1
+                
+                descriptions = self._parse_batch_response(response.text, len(products_data))
+                log_message(f"Generated {len([d for d in descriptions if d])} descriptions", "SUCCESS")
+                return descriptions
             
-            descriptions = self._parse_batch_response(response.text, len(products_data))
-            log_message(f"Generated {len([d for d in descriptions if d])} descriptions", "SUCCESS")
-            return descriptions
-        
-        except Exception as e:
-            log_message(f"Description generation failed: {e}", "ERROR")
-            return [None] * len(products_data)
+            except Exception as e:
+                if attempt == MAX_RETRIES:
+                    log_message(f"Description generation failed: {e}", "ERROR")
+                    return [None] * len(products_data)
+                # A 429 means the per-minute quota is spent; a short backoff would just hit it again
+                await asyncio.sleep(QUOTA_BACKOFF * (attempt + 1) if isinstance(e, ResourceExhausted) else 2 ** attempt)
     
     def _parse_batch_response(self, text: str, expected_count: int) -> List[Optional[str]]:
         """Parse numbered list response from API."""
@@ -183,6 +270,34 @@ Start with "1." - nothing before it. Number each item sequentially."""
         
         return items[:expected_count]
 
+# ============================================================================
+# BATCH PROCESSING
+# ============================================================================
+
+def product_data(product) -> Dict:
+    return {
+        'name': product.name,
+        'brand': product.brand.name if product.brand else 'Brand',
+        'category': product.category.name if product.category else 'Category'
+    }
+
+async def process_batches(generator: GeminiDescriptionGenerator, batches: List[List], save_batch,
+                          concurrency: int = CONCURRENCY):
+    """
+    Generate every batch with at most `concurrency` requests in flight (and request starts
+    spaced by the generator's RequestSpacer), handing each
+    result to save_batch as soon as it arrives. save_batch is sync_to_async-wrapped,
+    so database writes and progress saves run one at a time outside the event loop.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def process_batch(batch_num: int, batch: List):
+        async with semaphore:
+            new_descriptions = await generator.generate_batch_descriptions([product_data(p) for p in batch])
+        await save_batch(batch_num, batch, new_descriptions)
+
+    await asyncio.gather(*[process_batch(num, batch) for num, batch in enumerate(batches, 1)])
+
 # ============================================================================
 # MAIN SCRIPT
 # ============================================================================
@@ -213,8 +328,13 @@ Examples:
                        help='Filter by category (e.g., "laptop")')
     parser.add_argument('--limit', type=int, 
                        help='Maximum products to process')
+    parser.add_argument('--concurrency', type=int, default=CONCURRENCY,
+                       help=f'API requests in flight at once (default {CONCURRENCY})')
+    parser.add_argument('--rpm', type=float, default=REQUESTS_PER_MINUTE,
+                       help=f'Max API requests started per minute (default {REQUESTS_PER_MINUTE})')
     
     args = parser.parse_args()
+    concurrency = max(1, args.concurrency)
     
     # ========================================================================
     # VALIDATION
@@ -237,13 +357,13 @@ Examples:
     # SETUP
     # ========================================================================
     
-    generator = GeminiDescriptionGenerator(API_KEY)
-    progress = load_progress()
-    processed_ids = set(progress['processed'])
-    failed_ids = set(progress['failed'])
+    generator = GeminiDescriptionGenerator(API_KEY, rpm=max(1, args.rpm))
+    progress = ProgressLog()
+    processed_ids = progress.processed
+    failed_ids = progress.failed
     
-    # Get products
-    query = Product.objects.all()
+    # Get products (brand and category joined: every batch prompt reads both)
+    query = Product.objects.select_related('brand', 'category')
     
     if args.category:
         query = query.filter(category__name__icontains=args.category)
@@ -269,6 +389,7 @@ Examples:
     print(f"   • Already processed: {len(processed_ids)}")
     print(f"   • Failed previously: {len(failed_ids)}")
     print(f"   • Batch size: {BATCH_SIZE} products per request")
+    print(f"   • Concurrency: {concurrency} requests in flight, at most {args.rpm:g}/min")
     
     # Calculate API calls needed
     batches = (total + BATCH_SIZE - 1) // BATCH_SIZE
@@ -276,7 +397,7 @@ Examples:
     print(f"\n📞 API CALLS:")
     print(f"   • Expected total: {batches} requests")
     print(f"   • Gemini free tier: 20 requests/min")
-    print(f"   • Time estimate: {batches * 2}-{batches * 5} minutes\n")
+    print(f"   • Time estimate: at least {batches / max(1, args.rpm):.1f} minutes\n")
     
     if total == 0:
         log_message("No products to process!", "WARNING")
@@ -297,15 +418,7 @@ Examples:
         
         log_message("Generating sample descriptions...", "INFO")
         
-        desc_data = [
-            {
-                'name': p.name,
-                'brand': p.brand.name if p.brand else 'Brand',
-                'category': p.category.name if p.category else 'Category'
-            }
-            for p in sample_batch
-        ]
-        descriptions = generator.generate_batch_descriptions(desc_data)
+        descriptions = asyncio.run(generator.generate_batch_descriptions([product_data(p) for p in sample_batch]))
         
         for i, product in enumerate(sample_batch):
             print(f"\n--- Product {i+1} ---")
@@ -349,71 +462,44 @@ Examples:
     print("🔄 PROCESSING STARTED")
     print(f"{'='*80}\n")
     
-    progress['started_at'] = datetime.now().isoformat()
-    progress['total'] = total
-    save_progress(progress)
-    
     updated_count = 0
     failed_count = 0
     start_time = time.time()
     
-    # Process in batches
-    for batch_start in range(0, total, BATCH_SIZE):
-        batch_end = min(batch_start + BATCH_SIZE, total)
-        batch = products[batch_start:batch_end]
-        batch_num = (batch_start // BATCH_SIZE) + 1
-        total_batches = (total + BATCH_SIZE - 1) // BATCH_SIZE
+    product_batches = [products[start:start + BATCH_SIZE] for start in range(0, total, BATCH_SIZE)]
+    total_batches = len(product_batches)
+    
+    def save_batch(batch_num: int, batch: List, new_descriptions: List[Optional[str]]):
+        """Write one batch's descriptions in a single UPDATE and record progress."""
+        nonlocal updated_count, failed_count
         
-        print(f"[Batch {batch_num:2d}/{total_batches}] Processing {len(batch):2d} products...", 
-              end=" ", flush=True)
+        updated = []
+        for product, description in zip(batch, new_descriptions):
+            if description:
+                product.description = description
+                updated.append(product)
         
         try:
-            # Generate descriptions
-            desc_data = [
-                {
-                    'name': p.name,
-                    'brand': p.brand.name if p.brand else 'Brand',
-                    'category': p.category.name if p.category else 'Category'
-                }
-                for p in batch
-            ]
-            new_descriptions = generator.generate_batch_descriptions(desc_data)
-            time.sleep(DELAY_BETWEEN_CALLS)
-            
-            # Update database
-            batch_success = 0
-            for i, product in enumerate(batch):
-                try:
-                    if new_descriptions[i]:
-                        product.description = new_descriptions[i]
-                        product.save()
-                        processed_ids.add(product.product_id)
-                        batch_success += 1
-                        updated_count += 1
-                except Exception as e:
-                    log_message(f"Failed to save {product.name}: {e}", "ERROR")
-                    failed_ids.add(product.product_id)
-                    failed_count += 1
-            
-            print(f"✅ {batch_success}/{len(batch)} saved ({updated_count}/{total} total)")
-            
+            Product.objects.bulk_update(updated, ['description'])
+            updated_count += len(updated)
+            # Products the model returned nothing for count as failed but aren't recorded, so a re-run retries them
+            failed_count += len(batch) - len(updated)
+            print(f"[Batch {batch_num:2d}/{total_batches}] ✅ {len(updated)}/{len(batch)} saved ({updated_count}/{total} total)")
             # Save progress IMMEDIATELY after each batch
-            progress['processed'] = list(processed_ids)
-            progress['failed'] = list(failed_ids)
-            progress['last_batch'] = batch_num
-            save_progress(progress)
-        
+            progress.record(processed=[p.product_id for p in updated])
         except Exception as e:
-            print(f"❌ Batch error: {str(e)[:50]}")
+            print(f"[Batch {batch_num:2d}/{total_batches}] ❌ Batch error: {str(e)[:50]}")
+            log_message(f"Failed to save batch {batch_num}: {e}", "ERROR")
             failed_count += len(batch)
-            for p in batch:
-                failed_ids.add(p.product_id)
-            
             # Save progress even on error
-            progress['failed'] = list(failed_ids)
-            progress['processed'] = list(processed_ids)
-            progress['last_batch'] = batch_num
-            save_progress(progress)
+            progress.record(failed=[p.product_id for p in batch])
+    
+    try:
+        asyncio.run(process_batches(generator, product_batches, sync_to_async(save_batch), concurrency))
+    finally:
+        progress.close()
+    if updated_count:
+        bump_catalogue_version()  # bulk_update sends no post_save, so expire the cached catalogue responses here
     
     # ========================================================================
     # SUMMARY